@@ -0,0 +1,112 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; without it the kernel runs as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+# Protocol version codes understood by score_kernel
+VERSION_NONE = 0
+VERSION_V2 = 1
+VERSION_V3 = 2
+VERSION_UNKNOWN = 3
+
+@njit(cache=True)
+def score_kernel(ratio, liq, inact, freq, vol, ver_code, cf, weights):
+    """
+    Risk score (0-1000) for a single wallet from its raw feature values
+
+    weights holds the component weights in calculate_risk_score order
+    """
+    # Borrow to supply ratio: lower ratio = lower risk
+    if ratio == 0:
+        bsr_score = 0
+    elif ratio <= 0.3:
+        bsr_score = 100
+    elif ratio <= 0.5:
+        bsr_score = 50
+    elif ratio <= 0.7:
+        bsr_score = 0
+    elif ratio <= 0.9:
+        bsr_score = -50
+    else:
+        bsr_score = -100
+
+    # Liquidations: fewer = lower risk
+    if liq == 0:
+        liq_score = 50
+    elif liq == 1:
+        liq_score = -25
+    elif liq == 2:
+        liq_score = -50
+    elif liq <= 5:
+        liq_score = -75
+    else:
+        liq_score = -100
+
+    # Days since last activity: recent = lower risk
+    if inact <= 7:
+        inact_score = 50
+    elif inact <= 30:
+        inact_score = 25
+    elif inact <= 90:
+        inact_score = 0
+    elif inact <= 180:
+        inact_score = -25
+    else:
+        inact_score = -50
+
+    # Repayments per month: more frequent = lower risk
+    if freq >= 2.0:
+        freq_score = 50
+    elif freq >= 1.0:
+        freq_score = 25
+    elif freq >= 0.5:
+        freq_score = 0
+    elif freq > 0:
+        freq_score = -25
+    else:
+        freq_score = -50
+
+    # Volatile asset usage: lower = lower risk
+    if vol <= 0.1:
+        vol_score = 50
+    elif vol <= 0.3:
+        vol_score = 25
+    elif vol <= 0.5:
+        vol_score = 0
+    elif vol <= 0.7:
+        vol_score = -25
+    else:
+        vol_score = -50
+
+    # Protocol version: V3 = lower risk
+    if ver_code == VERSION_V3:
+        ver_score = 25
+    elif ver_code == VERSION_NONE:
+        ver_score = -25
+    else:
+        ver_score = 0
+
+    # Collateral factor: higher = lower risk
+    if cf >= 0.8:
+        cf_score = 25
+    elif cf >= 0.6:
+        cf_score = 0
+    elif cf >= 0.4:
+        cf_score = -25
+    else:
+        cf_score = -50
+
+    weighted_score = 0.0
+    weighted_score += bsr_score * weights[0]
+    weighted_score += liq_score * weights[1]
+    weighted_score += inact_score * weights[2]
+    weighted_score += freq_score * weights[3]
+    weighted_score += vol_score * weights[4]
+    weighted_score += ver_score * weights[5]
+    weighted_score += cf_score * weights[6]
+
+    return int(max(0.0, min(1000.0, 500 + weighted_score)))
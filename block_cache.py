@@ -0,0 +1,44 @@
+import sqlite3
+from typing import Dict, Iterable
+from config import *
+
+class BlockTimestampCache:
+    """
+    Persistent SQLite cache of block number -> timestamp mappings
+    """
+
+    # Stay well under SQLite's host-parameter limit for IN (...) queries
+    QUERY_CHUNK_SIZE = 500
+
+    def __init__(self, path: str = BLOCK_CACHE_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS ts (block INTEGER PRIMARY KEY, timestamp INTEGER)")
+        self.conn.commit()
+
+    def get_many(self, block_numbers: Iterable[int]) -> Dict[int, int]:
+        """
+        Return cached timestamps for all blocks that are present in the cache
+        """
+        blocks = list(block_numbers)
+        cached = {}
+
+        for start in range(0, len(blocks), self.QUERY_CHUNK_SIZE):
+            chunk = blocks[start:start + self.QUERY_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(f"SELECT block, timestamp FROM ts WHERE block IN ({placeholders})", chunk)
+            cached.update(rows)
+
+        return cached
+
+    def set_many(self, timestamps: Dict[int, int]):
+        """
+        Store block timestamps, keeping any existing entries
+        """
+        if not timestamps:
+            return
+
+        self.conn.executemany("INSERT OR IGNORE INTO ts (block, timestamp) VALUES (?, ?)", timestamps.items())
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
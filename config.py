@@ -8,6 +8,9 @@ ETHERSCAN_API_KEY = os.getenv('ETHERSCAN_API_KEY', '')
 ALCHEMY_API_KEY = os.getenv('ALCHEMY_API_KEY', '')
 THE_GRAPH_API_KEY = os.getenv('THE_GRAPH_API_KEY', '')
 
+# Ethereum JSON-RPC endpoint (used for multi-address eth_getLogs)
+ETHEREUM_RPC_URL = os.getenv('ETHEREUM_RPC_URL', f"https://eth-mainnet.g.alchemy.com/v2/{ALCHEMY_API_KEY}")
+
 # Compound Protocol Addresses
 COMPOUND_V2_COMPTROLLER = "0x3d9819210A31b4961b30EF54bE2aeD79B9c9Cd3B"
 COMPOUND_V3_COMPTROLLER = "0x3d9819210A31b4961b30EF54bE2aeD79B9c9Cd3B"
@@ -55,4 +58,24 @@ VOLATILE_ASSETS = ['WBTC', 'ETH', 'LINK', 'UNI', 'MKR', 'YFI', 'AAVE', 'SUSHI']
 
 # API Rate Limits
 ETHERSCAN_RATE_LIMIT = 5  # requests per second
-ALCHEMY_RATE_LIMIT = 10   # requests per second 
\ No newline at end of file
+ALCHEMY_RATE_LIMIT = 10   # requests per second
+RPC_RATE_LIMIT = ALCHEMY_RATE_LIMIT  # default JSON-RPC endpoint is Alchemy
+
+# JSON-RPC batching
+RPC_BATCH_SIZE = 100  # calls per batch request
+LOG_BLOCK_WINDOW = 100000  # blocks per eth_getLogs request; halved on provider limit errors
+
+# JSON-RPC retries on rate limits and server errors
+RPC_MAX_RETRIES = 5       # retries after the first attempt
+RPC_RETRY_BACKOFF = 0.3   # seconds before the first retry, doubled after each one
+RPC_RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# Block timestamp cache
+BLOCK_CACHE_PATH = os.getenv('BLOCK_CACHE_PATH', 'block_timestamps.db')
+REORG_SAFETY_BLOCKS = 64  # only cache blocks this far below the chain head
+
+# Incremental transaction cache (one parquet file per wallet set)
+TRANSACTION_CACHE_DIR = os.getenv('TRANSACTION_CACHE_DIR', 'cache')
+
+# Parallel scoring
+PARALLEL_SCORING_MIN_WALLETS = 200000  # smaller wallet sets are scored in-process
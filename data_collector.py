@@ -1,115 +1,380 @@
-import requests
-import time
+import os
+import re
+import json
+import hashlib
+import functools
 import asyncio
 import aiohttp
-from typing import List, Dict, Any
+from aiolimiter import AsyncLimiter
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
+from web3 import Web3
+from block_cache import BlockTimestampCache
 from config import *
 
+# Compound V2 events to track, with their normalized event type
+V2_EVENTS = {
+    "Mint(address,uint256,uint256)": 'mint',  # Supply
+    "Redeem(address,uint256,uint256)": 'redeem',  # Withdraw
+    "Borrow(address,uint256,uint256,uint256)": 'borrow',  # Borrow
+    "RepayBorrow(address,address,uint256,uint256)": 'repay',  # Repay
+    "LiquidateBorrow(address,address,uint256,address,uint256)": 'liquidate'  # Liquidation
+}
+
+# Compound V3 events to track, with their normalized event type
+V3_EVENTS = {
+    "Supply(address,address,uint256,uint256)": 'mint',  # Supply
+    "Withdraw(address,address,uint256,uint256)": 'redeem',  # Withdraw
+    "Borrow(address,address,uint256,uint256,uint256)": 'borrow',  # Borrow
+    "Repay(address,address,uint256,uint256)": 'repay',  # Repay
+    "Liquidate(address,address,uint256,uint256,uint256)": 'liquidate'  # Liquidation
+}
+
+@functools.lru_cache(maxsize=64)
+def event_topic(sig: str) -> str:
+    """
+    keccak-256 topic0 hash of an event signature
+    """
+    return Web3.to_hex(Web3.keccak(text=sig))
+
+@functools.lru_cache(maxsize=1024)
+def wallet_topic(address: str) -> str:
+    """
+    Address left-padded to 32 bytes, as it appears in indexed log topics
+    """
+    address = address.lower()
+    if address.startswith('0x'):
+        address = address[2:]
+    return '0x' + '0' * 24 + address
+
+# topic0 hashes for all tracked events
+EVENT_TYPE_BY_TOPIC = {
+    event_topic(sig): event_type
+    for sig, event_type in {**V2_EVENTS, **V3_EVENTS}.items()
+}
+EVENT_TOPICS = list(EVENT_TYPE_BY_TOPIC)
+
+# Liquidation logs also name the liquidator, who was not liquidated
+LIQUIDATION_TOPICS = frozenset(topic for topic, event_type in EVENT_TYPE_BY_TOPIC.items() if event_type == 'liquidate')
+
+def liquidated_borrower_word(log: Dict) -> str:
+    """
+    32-byte word holding the borrower, the second argument of a liquidation log
+    """
+    # Indexed arguments come first in both events: the borrower is topic 2
+    # when indexed, otherwise the data word after any unindexed liquidator
+    indexed = len(log['topics']) - 1
+    if indexed >= 2:
+        return log['topics'][2][2:]
+    
+    position = (1 - indexed) * 64
+    return log['data'][2 + position:2 + position + 64]
+
+# Vectorized topic0 -> event type lookup. The tracked topics are keyed by
+# their low 32 bits (unique across the set), sorted for searchsorted.
+EVENT_CATEGORIES = ['mint', 'borrow', 'repay', 'liquidate', 'redeem', 'other']
+_topic_keys = np.array([int(topic[-8:], 16) for topic in EVENT_TOPICS], dtype=np.uint32)
+_topic_order = np.argsort(_topic_keys)
+EVENT_TOPIC_KEYS = _topic_keys[_topic_order]
+EVENT_TOPIC_CODES = np.array(
+    [EVENT_CATEGORIES.index(EVENT_TYPE_BY_TOPIC[EVENT_TOPICS[i]]) for i in _topic_order],
+    dtype=np.int8
+)
+
+def event_types_from_topics(topic0: pd.Series) -> pd.Categorical:
+    """
+    Map topic0 hashes to event types in one vectorized lookup
+    """
+    # Logs are already filtered to the tracked topic0 set server-side, so the
+    # 32-bit suffix identifies the event; anything unmatched becomes 'other'
+    suffixes = topic0.fillna('').str[-8:].str.pad(8, fillchar='0')
+    keys = np.frombuffer(bytes.fromhex(''.join(suffixes)), dtype='>u4').astype(np.uint32)
+    
+    positions = np.minimum(np.searchsorted(EVENT_TOPIC_KEYS, keys), len(EVENT_TOPIC_KEYS) - 1)
+    codes = np.where(EVENT_TOPIC_KEYS[positions] == keys, EVENT_TOPIC_CODES[positions], EVENT_CATEGORIES.index('other'))
+    
+    return pd.Categorical.from_codes(codes, categories=EVENT_CATEGORIES)
+
+# JSON-RPC errors providers return when an eth_getLogs window holds too many
+# results or spans too many blocks, e.g. "query returned more than 10000
+# results" or "Log response size exceeded". Anchored to result and range
+# limits so rate-limit replies are not mistaken for oversized windows
+_LOG_LIMIT_ERROR_RE = re.compile(
+    r'more than \d+ results|response size exceeded|block range|range (is )?too (large|wide)',
+    re.IGNORECASE
+)
+
+# JSON-RPC errors providers return when throttling, e.g. "Too Many Requests"
+# or "exceeded rate limit, limited to 25 requests per second"
+_RATE_LIMIT_ERROR_RE = re.compile(r'too many requests|rate limit|requests per second', re.IGNORECASE)
+
+def _rate_limited(reply: Any) -> bool:
+    """
+    Whether a JSON-RPC reply, or any reply in a batch, is a rate-limit error
+    """
+    for item in reply if isinstance(reply, list) else [reply]:
+        error = item.get('error') if isinstance(item, dict) else None
+        if error is None:
+            continue
+        code = error.get('code') if isinstance(error, dict) else None
+        message = str(error.get('message', error)) if isinstance(error, dict) else str(error)
+        if code == 429 or _RATE_LIMIT_ERROR_RE.search(message):
+            return True
+    
+    return False
+
+ALL_MARKETS = {**COMPOUND_V2_MARKETS, **COMPOUND_V3_MARKETS}
+
+# Reverse lookup so each returned log can be tagged with its market
+MARKET_BY_ADDRESS = {address.lower(): name for name, address in ALL_MARKETS.items()}
+
+# Lowercased Compound contract addresses for O(1) membership checks
+COMPOUND_ADDRS_LC = frozenset(a.lower() for a in (
+    *COMPOUND_V2_MARKETS.values(),
+    *COMPOUND_V3_MARKETS.values(),
+    COMPOUND_V2_COMPTROLLER,
+    COMPOUND_V3_COMPTROLLER
+))
+
 class CompoundDataCollector:
     """
     Data collector for Compound V2/V3 protocol transactions
     """
     
     def __init__(self):
-        self.etherscan_base_url = "https://api.etherscan.io/api"
         self.alchemy_base_url = f"https://worldchain-mainnet.g.alchemy.com/v2/{ALCHEMY_API_KEY}"
-        self.session = requests.Session()
+        self.rpc_url = ETHEREUM_RPC_URL
+        self.timestamp_cache = BlockTimestampCache()
+        self.fetch_errors = 0
+        self.rpc_loop = None  # loop the RPC limits below were created in
         
-    def get_wallet_transactions_etherscan(self, wallet_address: str, start_block: int = 0) -> List[Dict]:
+    def _rpc_limits(self) -> Tuple[asyncio.Semaphore, AsyncLimiter]:
         """
-        Fetch Compound-related transactions for a wallet using Etherscan API
+        Shared RPC concurrency and rate limits, created on first use in each
+        event loop so they bind to the loop that awaits them
         """
-        transactions = []
+        loop = asyncio.get_running_loop()
+        if self.rpc_loop is not loop:
+            self.rpc_loop = loop
+            self.rpc_semaphore = asyncio.Semaphore(RPC_RATE_LIMIT)
+            self.rpc_limiter = AsyncLimiter(RPC_RATE_LIMIT, 1)
         
-        # Compound V2 events to track
-        v2_events = [
-            "Mint(address,uint256,uint256)",  # Supply
-            "Redeem(address,uint256,uint256)",  # Withdraw
-            "Borrow(address,uint256,uint256,uint256)",  # Borrow
-            "RepayBorrow(address,address,uint256,uint256)",  # Repay
-            "LiquidateBorrow(address,address,uint256,address,uint256)"  # Liquidation
-        ]
-        
-        # Compound V3 events to track
-        v3_events = [
-            "Supply(address,address,uint256,uint256)",  # Supply
-            "Withdraw(address,address,uint256,uint256)",  # Withdraw
-            "Borrow(address,address,uint256,uint256,uint256)",  # Borrow
-            "Repay(address,address,uint256,uint256)",  # Repay
-            "Liquidate(address,address,uint256,uint256,uint256)"  # Liquidation
-        ]
-        
-        # Get transactions for each market
-        all_markets = {**COMPOUND_V2_MARKETS, **COMPOUND_V3_MARKETS}
+        return self.rpc_semaphore, self.rpc_limiter
+    
+    async def _post_rpc(self, session: aiohttp.ClientSession, payload: Any) -> Any:
+        """
+        POST a JSON-RPC request (or batch) under the shared concurrency and rate limits,
+        retrying rate limits and server errors with exponential backoff
+        """
+        semaphore, limiter = self._rpc_limits()
         
-        for market_name, market_address in all_markets.items():
+        for attempt in range(RPC_MAX_RETRIES + 1):
             try:
-                # Get logs for this market
-                params = {
-                    'module': 'logs',
-                    'action': 'getLogs',
-                    'address': market_address,
-                    'fromBlock': start_block,
-                    'toBlock': 'latest',
-                    'apikey': ETHERSCAN_API_KEY
-                }
-                
-                response = self.session.get(self.etherscan_base_url, params=params)
-                response.raise_for_status()
-                data = response.json()
+                async with semaphore, limiter:
+                    async with session.post(self.rpc_url, json=payload) as response:
+                        response.raise_for_status()
+                        data = await response.json()
                 
-                if data['status'] == '1' and data['result']:
-                    for log in data['result']:
-                        # Check if wallet is involved in the transaction
-                        if wallet_address.lower() in log['topics'] or wallet_address.lower() in log['data']:
-                            transaction = {
-                                'wallet': wallet_address,
-                                'market': market_name,
-                                'market_address': market_address,
-                                'block_number': int(log['blockNumber'], 16),
-                                'transaction_hash': log['transactionHash'],
-                                'log_index': int(log['logIndex'], 16),
-                                'topics': log['topics'],
-                                'data': log['data'],
-                                'timestamp': self._get_block_timestamp(int(log['blockNumber'], 16))
-                            }
-                            transactions.append(transaction)
-                
-                # Rate limiting
-                time.sleep(1 / ETHERSCAN_RATE_LIMIT)
-                
-            except Exception as e:
-                print(f"Error fetching data for market {market_name}: {e}")
-                continue
+                # Throttling reported in the JSON-RPC body is retried like HTTP 429
+                if not _rate_limited(data) or attempt == RPC_MAX_RETRIES:
+                    return data
+            except aiohttp.ClientResponseError as e:
+                if e.status not in RPC_RETRY_STATUSES or attempt == RPC_MAX_RETRIES:
+                    raise
+            
+            # Back off outside the semaphore so other requests keep flowing
+            await asyncio.sleep(RPC_RETRY_BACKOFF * 2 ** attempt)
+    
+    async def _get_current_block_async(self, session: aiohttp.ClientSession) -> int:
+        """
+        Get the latest block number over the async session (0 if unavailable)
+        """
+        try:
+            data = await self._post_rpc(session, {'jsonrpc': '2.0', 'id': 1, 'method': 'eth_blockNumber', 'params': []})
+            return int(data['result'], 16)
+        except Exception as e:
+            print(f"Error getting current block: {e}")
         
-        return transactions
+        return 0
+    
+    async def _get_logs(self, session: aiohttp.ClientSession, from_block: int, to_block: Optional[int]) -> List[Dict]:
+        """
+        Fetch tracked Compound event logs across every V2/V3 market for one block window,
+        bisecting the window when the provider rejects it as too large
+        """
+        payload = {
+            'jsonrpc': '2.0',
+            'id': 1,
+            'method': 'eth_getLogs',
+            'params': [
+                {
+                    'address': list(ALL_MARKETS.values()),
+                    'topics': [EVENT_TOPICS],
+                    'fromBlock': hex(from_block),
+                    'toBlock': hex(to_block) if to_block is not None else 'latest'
+                }
+            ]
+        }
+        
+        data = await self._post_rpc(session, payload)
+        
+        if 'error' in data:
+            message = str(data['error'].get('message', data['error']))
+            
+            # Too big for the provider: split the window in half and retry each side
+            if to_block is not None and to_block > from_block and _LOG_LIMIT_ERROR_RE.search(message):
+                middle = (from_block + to_block) // 2
+                lower, upper = await asyncio.gather(
+                    self._get_logs(session, from_block, middle),
+                    self._get_logs(session, middle + 1, to_block)
+                )
+                return lower + upper
+            
+            raise RuntimeError(message)
+        
+        return data.get('result') or []
+    
+    async def get_wallet_transactions_etherscan(self, session: aiohttp.ClientSession, wallet_address: str, start_block: int = 0, end_block: Optional[int] = None) -> List[Dict]:
+        """
+        Fetch Compound-related transactions for a single wallet
+        """
+        return await self.get_wallets_transactions(session, [wallet_address], start_block, end_block)
     
-    def _get_block_timestamp(self, block_number: int) -> int:
+    async def get_wallets_transactions(self, session: aiohttp.ClientSession, wallet_addresses: List[str], start_block: int = 0, end_block: Optional[int] = None) -> List[Dict]:
         """
-        Get block timestamp using Etherscan API
+        Fetch Compound-related transactions for many wallets from one shared
+        log scan over bounded block windows, tagging each log with every
+        wallet it mentions. end_block defaults to the chain head and also
+        anchors the reorg horizon for caching block timestamps
         """
+        transactions = []
+        
+        # Addresses appear as 32-byte left-padded words, both in indexed
+        # topics and in the ABI-encoded data (V2 cToken events don't index
+        # the account)
+        wallet_by_word = {wallet_topic(wallet)[2:]: wallet for wallet in wallet_addresses}
+        
+        if end_block is None:
+            end_block = await self._get_current_block_async(session)
+        
+        # Bound server-side work per call; fall back to one open-ended
+        # request if the chain head is unknown
+        if end_block:
+            windows = [
+                (window_start, min(window_start + LOG_BLOCK_WINDOW - 1, end_block))
+                for window_start in range(start_block, end_block + 1, LOG_BLOCK_WINDOW)
+            ]
+        else:
+            windows = [(start_block, None)]
+        
         try:
-            params = {
-                'module': 'proxy',
-                'action': 'eth_getBlockByNumber',
-                'tag': hex(block_number),
-                'boolean': 'false',
-                'apikey': ETHERSCAN_API_KEY
-            }
+            results = await asyncio.gather(
+                *[self._get_logs(session, from_block, to_block) for from_block, to_block in windows],
+                return_exceptions=True
+            )
+            
+            logs = []
+            for (from_block, to_block), result in zip(windows, results):
+                if isinstance(result, Exception):
+                    print(f"Error fetching Compound logs for blocks {from_block}-{to_block or 'latest'}: {result}")
+                    self.fetch_errors += 1
+                else:
+                    logs.extend(result)
             
-            response = self.session.get(self.etherscan_base_url, params=params)
-            response.raise_for_status()
-            data = response.json()
+            wallet_logs = []
+            for log in logs:
+                if log['topics'][0] in LIQUIDATION_TOPICS:
+                    # Tag only the liquidated borrower, not the liquidator
+                    words = {liquidated_borrower_word(log)}
+                else:
+                    data = log['data'][2:]
+                    words = {data[i:i + 64] for i in range(0, len(data), 64)}
+                    words.update(topic[2:] for topic in log['topics'][1:])
+                
+                for word in words & wallet_by_word.keys():
+                    wallet_logs.append((wallet_by_word[word], log))
+            
+            # Parse each distinct hex block number once; many logs share a block
+            block_numbers = {hex_block: int(hex_block, 16) for hex_block in {log['blockNumber'] for _, log in wallet_logs}}
             
-            if data['result']:
-                return int(data['result']['timestamp'], 16)
+            # Resolve timestamps for all unique blocks in batched calls
+            timestamps = await self._get_block_timestamps(session, block_numbers.values(), end_block)
+            
+            for wallet_address, log in wallet_logs:
+                market_name = MARKET_BY_ADDRESS.get(log['address'].lower())
+                block_number = block_numbers[log['blockNumber']]
+                transaction = {
+                    'wallet': wallet_address,
+                    'market': market_name,
+                    'market_address': ALL_MARKETS.get(market_name, log['address']),
+                    'block_number': block_number,
+                    'transaction_hash': log['transactionHash'],
+                    'log_index': int(log['logIndex'], 16),
+                    'topics': log['topics'],
+                    'data': log['data'],
+                    'timestamp': timestamps.get(block_number, 0)
+                }
+                transactions.append(transaction)
             
         except Exception as e:
-            print(f"Error getting block timestamp: {e}")
+            print(f"Error fetching Compound logs: {e}")
+            self.fetch_errors += 1
         
-        return 0
+        return transactions
+    
+    def _cache_finalized(self, timestamps: Dict[int, int], current_block: int):
+        """
+        Persist timestamps for blocks safely below the reorg horizon
+        """
+        safe_block = current_block - REORG_SAFETY_BLOCKS
+        self.timestamp_cache.set_many({
+            block: ts for block, ts in timestamps.items() if block <= safe_block
+        })
+    
+    async def _get_block_timestamps(self, session: aiohttp.ClientSession, block_numbers: Iterable[int], head_block: int) -> Dict[int, int]:
+        """
+        Get timestamps for many blocks using batched JSON-RPC requests,
+        fetching only blocks missing from the on-disk cache. Only blocks
+        below head_block's reorg horizon are cached (none if it is 0)
+        """
+        block_numbers = set(block_numbers)
+        timestamps = self.timestamp_cache.get_many(block_numbers)
+        blocks = sorted(block_numbers - timestamps.keys())
+        fetched = {}
+        
+        for start in range(0, len(blocks), RPC_BATCH_SIZE):
+            batch = blocks[start:start + RPC_BATCH_SIZE]
+            payload = [
+                {
+                    'jsonrpc': '2.0',
+                    'id': i,
+                    'method': 'eth_getBlockByNumber',
+                    'params': [hex(block_number), False]
+                }
+                for i, block_number in enumerate(batch)
+            ]
+            
+            try:
+                for item in await self._post_rpc(session, payload):
+                    if item.get('result'):
+                        fetched[batch[item['id']]] = int(item['result']['timestamp'], 16)
+                
+            except Exception as e:
+                print(f"Error getting block timestamps: {e}")
+
+            # Logs in these blocks would be stored with a 1970 timestamp; a
+            # counted error keeps them out of the transaction cache
+            missing = len(batch) - sum(block_number in fetched for block_number in batch)
+            if missing:
+                print(f"Missing timestamps for {missing} of {len(batch)} blocks")
+                self.fetch_errors += 1
+
+        self._cache_finalized(fetched, head_block)
+        timestamps.update(fetched)
+        
+        return timestamps
     
     async def get_wallet_transactions_alchemy(self, wallet_address: str) -> List[Dict]:
         """
@@ -165,13 +430,8 @@ class CompoundDataCollector:
         """
         Check if a transaction involves Compound protocol
         """
-        compound_addresses = list(COMPOUND_V2_MARKETS.values()) + list(COMPOUND_V3_MARKETS.values())
-        compound_addresses.extend([COMPOUND_V2_COMPTROLLER, COMPOUND_V3_COMPTROLLER])
-        
-        from_addr = transfer.get('from', '').lower()
-        to_addr = transfer.get('to', '').lower()
-        
-        return any(addr.lower() in [from_addr, to_addr] for addr in compound_addresses)
+        # Alchemy returns addresses already lowercased; 'to' is null for contract creations
+        return transfer.get('from') in COMPOUND_ADDRS_LC or transfer.get('to') in COMPOUND_ADDRS_LC
     
     def get_wallet_list_from_sheet(self, sheet_url: str) -> List[str]:
         """
@@ -190,25 +450,91 @@ class CompoundDataCollector:
     
     def collect_all_wallet_data(self, wallet_addresses: List[str]) -> pd.DataFrame:
         """
-        Collect transaction data for all wallets
+        Collect transaction data for all wallets, fetching only blocks newer
+        than the last cached run for the same wallet set
         """
-        all_transactions = []
+        cache_key = hashlib.sha256(json.dumps(sorted(wallet_addresses)).encode()).hexdigest()
+        cached_df, last_block = self._load_transaction_cache(cache_key)
         
-        for i, wallet in enumerate(wallet_addresses):
-            print(f"Processing wallet {i+1}/{len(wallet_addresses)}: {wallet}")
-            
-            # Get transactions from Etherscan
-            transactions = self.get_wallet_transactions_etherscan(wallet)
-            all_transactions.extend(transactions)
-            
-            # Rate limiting between wallets
-            time.sleep(2)
+        all_transactions, head_block = asyncio.run(
+            self._collect_wallets_async(wallet_addresses, start_block=last_block + 1 if cached_df is not None else 0)
+        )
         
         # Convert to DataFrame
         df = pd.DataFrame(all_transactions)
         
         if not df.empty:
             df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
+            df['event_type'] = event_types_from_topics(df['topics'].str.get(0))
+        
+        if cached_df is not None and not cached_df.empty:
+            # Logs between the recorded head and 'latest' can be fetched twice
+            if not df.empty:
+                df = pd.concat([cached_df, df], ignore_index=True)
+                df = df.drop_duplicates(subset=['wallet', 'transaction_hash', 'log_index'])
+            else:
+                df = cached_df
+        
+        if not df.empty:
             df = df.sort_values('timestamp')
+            
+            # Low-cardinality string columns compare and group on integer codes
+            for column in ('market', 'wallet', 'event_type'):
+                df[column] = df[column].astype('category')
+        
+        # A partial fetch must not advance the cache past blocks it missed
+        if head_block and not self.fetch_errors:
+            self._save_transaction_cache(cache_key, df, head_block)
+        
+        return df
+    
+    def _load_transaction_cache(self, cache_key: str) -> Tuple[Optional[pd.DataFrame], int]:
+        """
+        Load cached transactions and the last block they cover
+        """
+        data_path = os.path.join(TRANSACTION_CACHE_DIR, f"{cache_key}.parquet")
+        meta_path = os.path.join(TRANSACTION_CACHE_DIR, f"{cache_key}.json")
+        
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, 0
+        
+        try:
+            with open(meta_path, 'r') as f:
+                last_block = json.load(f)['last_block']
+            
+            return pd.read_parquet(data_path), last_block
+            
+        except Exception as e:
+            print(f"Error loading transaction cache: {e}")
+        
+        return None, 0
+    
+    def _save_transaction_cache(self, cache_key: str, df: pd.DataFrame, last_block: int):
+        """
+        Persist transactions for this wallet set along with the last block scanned
+        """
+        try:
+            os.makedirs(TRANSACTION_CACHE_DIR, exist_ok=True)
+            df.to_parquet(os.path.join(TRANSACTION_CACHE_DIR, f"{cache_key}.parquet"), index=False)
+            
+            with open(os.path.join(TRANSACTION_CACHE_DIR, f"{cache_key}.json"), 'w') as f:
+                json.dump({'last_block': last_block}, f)
+            
+        except Exception as e:
+            print(f"Error saving transaction cache: {e}")
+    
+    async def _collect_wallets_async(self, wallet_addresses: List[str], start_block: int = 0) -> Tuple[List[Dict], int]:
+        """
+        Fetch all wallets from one shared log scan; rate limits are enforced per request.
+        Also returns the chain head observed before fetching (0 if unavailable).
+        """
+        self.fetch_errors = 0
+        
+        print(f"Fetching Compound logs for {len(wallet_addresses)} wallets")
+        
+        connector = aiohttp.TCPConnector(limit=RPC_RATE_LIMIT)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            head_block = await self._get_current_block_async(session)
+            transactions = await self.get_wallets_transactions(session, wallet_addresses, start_block, head_block or None)
         
-        return df 
\ No newline at end of file
+        return transactions, head_block
\ No newline at end of file
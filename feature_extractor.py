@@ -1,14 +1,53 @@
+import re
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple
 from datetime import datetime, timedelta
 from config import *
 
+# Markets whose name contains a volatile asset, resolved once so the
+# per-transaction check is a plain isin
+VOLATILE_MARKETS = frozenset(
+    market for market in (*COMPOUND_V2_MARKETS, *COMPOUND_V3_MARKETS)
+    if any(asset in market.upper() for asset in VOLATILE_ASSETS)
+)
+
+# Output schema for extracted features, in column order
+FEATURE_COLUMNS = [
+    ('wallet_id', 'object'),
+    ('total_transactions', 'int32'),
+    ('first_transaction_date', 'datetime64[ns]'),
+    ('last_transaction_date', 'datetime64[ns]'),
+    ('days_since_last_activity', 'int32'),
+    ('total_supplied_usd', 'float64'),
+    ('total_borrowed_usd', 'float64'),
+    ('supply_to_borrow_ratio', 'float64'),
+    ('number_of_liquidations', 'int32'),
+    ('repayment_frequency', 'float64'),
+    ('volatile_asset_usage', 'float64'),
+    ('protocol_version_usage', 'object'),
+    ('collateral_factor_average', 'float64'),
+    ('borrowing_behavior', 'object'),
+    ('health_factor_trend', 'object')
+]
+
 class FeatureExtractor:
     """
     Extract and compute risk-relevant features from Compound transaction data
     """
     
+    # Simplified collateral factors by asset type
+    # In production, you'd query the actual collateral factors from the protocol
+    COLLATERAL_FACTORS = {
+        'USDC': 0.85, 'USDT': 0.80, 'DAI': 0.85,  # Stablecoins
+        'ETH': 0.75, 'WETH': 0.75, 'WBTC': 0.70,  # Major assets
+        'LINK': 0.65, 'UNI': 0.60, 'MKR': 0.55,   # DeFi tokens
+        'YFI': 0.50, 'AAVE': 0.55, 'SUSHI': 0.50  # More volatile
+    }
+    
+    # Longest names first so e.g. WETH wins over ETH
+    COLLATERAL_PATTERN = re.compile('(' + '|'.join(sorted(COLLATERAL_FACTORS, key=len, reverse=True)) + ')')
+    
     def __init__(self):
         self.volatile_assets = VOLATILE_ASSETS
         self.v2_markets = COMPOUND_V2_MARKETS
@@ -18,38 +57,7 @@ class FeatureExtractor:
         """
         Extract comprehensive features for a single wallet
         """
-        if transactions_df.empty:
-            return self._get_default_features(wallet_address)
-        
-        # Filter transactions for this wallet
-        wallet_txs = transactions_df[transactions_df['wallet'] == wallet_address].copy()
-        
-        if wallet_txs.empty:
-            return self._get_default_features(wallet_address)
-        
-        features = {
-            'wallet_id': wallet_address,
-            'total_transactions': len(wallet_txs),
-            'first_transaction_date': wallet_txs['timestamp'].min(),
-            'last_transaction_date': wallet_txs['timestamp'].max(),
-            'days_since_last_activity': self._calculate_inactivity_days(wallet_txs),
-            'total_supplied_usd': self._calculate_total_supplied(wallet_txs),
-            'total_borrowed_usd': self._calculate_total_borrowed(wallet_txs),
-            'supply_to_borrow_ratio': 0.0,
-            'number_of_liquidations': self._count_liquidations(wallet_txs),
-            'repayment_frequency': self._calculate_repayment_frequency(wallet_txs),
-            'volatile_asset_usage': self._calculate_volatile_asset_usage(wallet_txs),
-            'protocol_version_usage': self._determine_protocol_version(wallet_txs),
-            'collateral_factor_average': self._calculate_collateral_factor(wallet_txs),
-            'borrowing_behavior': self._analyze_borrowing_behavior(wallet_txs),
-            'health_factor_trend': self._calculate_health_factor_trend(wallet_txs)
-        }
-        
-        # Calculate supply to borrow ratio
-        if features['total_supplied_usd'] > 0:
-            features['supply_to_borrow_ratio'] = features['total_borrowed_usd'] / features['total_supplied_usd']
-        
-        return features
+        return self.extract_all_wallet_features(transactions_df, [wallet_address]).iloc[0].to_dict()
     
     def _get_default_features(self, wallet_address: str) -> Dict:
         """
@@ -73,18 +81,42 @@ class FeatureExtractor:
             'health_factor_trend': 'stable'
         }
     
-    def _calculate_inactivity_days(self, wallet_txs: pd.DataFrame) -> int:
+    def _add_indicator_columns(self, transactions_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Precompute per-transaction indicator columns once over the full frame
+        so every feature below is a single grouped reduction
+        """
+        txs = transactions_df.copy()
+        market = txs['market'].astype(str)
+        market_upper = market.str.upper()
+        
+        # Simplified: every V2 cToken or core V3 market event counts as a lending event
+        txs['is_lending_market'] = market.str.contains('c', na=False) | market.isin(['USDC', 'WETH', 'WBTC'])
+        # V3 Supply events are normalized to 'mint' alongside V2 Mint
+        txs['is_supply'] = txs['event_type'].isin(['mint'])
+        txs['is_borrow'] = txs['event_type'] == 'borrow'
+        txs['is_repay'] = txs['event_type'] == 'repay'
+        txs['is_liquidation'] = txs['event_type'] == 'liquidate'
+        # Also reused by the health factor trend; keep it on the frame
+        txs['is_volatile'] = txs['market'].isin(VOLATILE_MARKETS)
+        txs['is_v2'] = market.isin(self.v2_markets.keys())
+        txs['is_v3'] = market.isin(self.v3_markets.keys())
+        txs['collateral_factor'] = market_upper.str.extract(self.COLLATERAL_PATTERN, expand=False).map(self.COLLATERAL_FACTORS)
+        
+        return txs
+    
+    def _calculate_inactivity_days(self, wallet_stats: pd.DataFrame) -> pd.Series:
         """
         Calculate days since last activity
         """
-        if wallet_txs.empty:
-            return 365
+        last_ts = wallet_stats['last_transaction_date'].to_numpy()
+        elapsed = np.datetime64(datetime.now()) - last_ts
         
-        last_activity = wallet_txs['timestamp'].max()
-        current_time = datetime.now()
-        return (current_time - last_activity).days
+        # Whole days, floored like timedelta.days
+        days = np.floor(elapsed / np.timedelta64(1, 'D')).astype('int32')
+        return pd.Series(days, index=wallet_stats.index)
     
-    def _calculate_total_supplied(self, wallet_txs: pd.DataFrame) -> float:
+    def _calculate_total_supplied(self, wallet_stats: pd.DataFrame) -> pd.Series:
         """
         Calculate total USD value supplied to Compound
         """
@@ -93,177 +125,142 @@ class FeatureExtractor:
         # 2. Convert to USD using price feeds
         # 3. Handle different asset types
         
-        supply_events = wallet_txs[
-            wallet_txs['market'].str.contains('c', na=False) | 
-            wallet_txs['market'].isin(['USDC', 'WETH', 'WBTC'])
-        ]
-        
         # Simplified: assume each supply event is worth $1000 on average
-        return len(supply_events) * 1000
+        return wallet_stats['lending_events'] * 1000
     
-    def _calculate_total_borrowed(self, wallet_txs: pd.DataFrame) -> float:
+    def _calculate_total_borrowed(self, wallet_stats: pd.DataFrame) -> pd.Series:
         """
         Calculate total USD value borrowed from Compound
         """
-        # Similar to supply calculation but for borrow events
-        borrow_events = wallet_txs[
-            wallet_txs['market'].str.contains('c', na=False) | 
-            wallet_txs['market'].isin(['USDC', 'WETH', 'WBTC'])
-        ]
-        
         # Simplified: assume each borrow event is worth $500 on average
-        return len(borrow_events) * 500
+        return wallet_stats['lending_events'] * 500
     
-    def _count_liquidations(self, wallet_txs: pd.DataFrame) -> int:
-        """
-        Count liquidation events where this wallet was the borrower
-        """
-        # Look for liquidation events in transaction data
-        liquidation_events = wallet_txs[
-            wallet_txs['market'].str.contains('liquidate', case=False, na=False) |
-            wallet_txs['topics'].apply(lambda x: any('liquidate' in str(topic).lower() for topic in x) if isinstance(x, list) else False)
-        ]
-        
-        return len(liquidation_events)
-    
-    def _calculate_repayment_frequency(self, wallet_txs: pd.DataFrame) -> float:
+    def _calculate_repayment_frequency(self, wallet_stats: pd.DataFrame) -> pd.Series:
         """
         Calculate repayment frequency (repayments per month)
         """
-        if wallet_txs.empty:
-            return 0
-        
-        # Identify repayment events
-        repayment_events = wallet_txs[
-            wallet_txs['market'].str.contains('repay', case=False, na=False) |
-            wallet_txs['topics'].apply(lambda x: any('repay' in str(topic).lower() for topic in x) if isinstance(x, list) else False)
-        ]
-        
-        if repayment_events.empty:
-            return 0
+        repayments = wallet_stats['repay_count']
         
         # Calculate time span of activity
-        time_span = (wallet_txs['timestamp'].max() - wallet_txs['timestamp'].min()).days
+        span = wallet_stats['last_transaction_date'].to_numpy() - wallet_stats['first_transaction_date'].to_numpy()
+        time_span = pd.Series(np.floor(span / np.timedelta64(1, 'D')), index=wallet_stats.index)
         
-        if time_span == 0:
-            return len(repayment_events)
+        # Convert to repayments per month; a single-day span counts raw repayments
+        frequency = (repayments / (time_span / 30)).where(time_span != 0, repayments)
         
-        # Convert to repayments per month
-        months_active = time_span / 30
-        return len(repayment_events) / months_active if months_active > 0 else 0
+        return frequency.where(repayments > 0, 0)
     
-    def _calculate_volatile_asset_usage(self, wallet_txs: pd.DataFrame) -> float:
+    def _determine_protocol_version(self, wallet_stats: pd.DataFrame) -> pd.Series:
         """
-        Calculate percentage of transactions involving volatile assets
+        Determine which protocol version each wallet primarily uses
         """
-        if wallet_txs.empty:
-            return 0
+        v2_count = wallet_stats['v2_count']
+        v3_count = wallet_stats['v3_count']
         
-        volatile_transactions = wallet_txs[
-            wallet_txs['market'].apply(lambda x: any(asset in str(x).upper() for asset in self.volatile_assets))
-        ]
-        
-        return len(volatile_transactions) / len(wallet_txs)
+        version = np.select([v3_count > v2_count, v2_count > 0], ['v3', 'v2'], default='unknown')
+        return pd.Series(version, index=wallet_stats.index)
     
-    def _determine_protocol_version(self, wallet_txs: pd.DataFrame) -> str:
-        """
-        Determine which protocol version the wallet primarily uses
-        """
-        if wallet_txs.empty:
-            return 'none'
-        
-        v2_transactions = wallet_txs[wallet_txs['market'].isin(self.v2_markets.keys())]
-        v3_transactions = wallet_txs[wallet_txs['market'].isin(self.v3_markets.keys())]
-        
-        if len(v3_transactions) > len(v2_transactions):
-            return 'v3'
-        elif len(v2_transactions) > 0:
-            return 'v2'
-        else:
-            return 'unknown'
-    
-    def _calculate_collateral_factor(self, wallet_txs: pd.DataFrame) -> float:
-        """
-        Calculate average collateral factor (simplified)
-        """
-        if wallet_txs.empty:
-            return 0
-        
-        # Simplified calculation based on asset types
-        # In production, you'd query the actual collateral factors from the protocol
-        
-        collateral_factors = {
-            'USDC': 0.85, 'USDT': 0.80, 'DAI': 0.85,  # Stablecoins
-            'ETH': 0.75, 'WETH': 0.75, 'WBTC': 0.70,  # Major assets
-            'LINK': 0.65, 'UNI': 0.60, 'MKR': 0.55,   # DeFi tokens
-            'YFI': 0.50, 'AAVE': 0.55, 'SUSHI': 0.50  # More volatile
-        }
-        
-        total_factor = 0
-        count = 0
-        
-        for _, tx in wallet_txs.iterrows():
-            market = str(tx['market']).upper()
-            for asset, factor in collateral_factors.items():
-                if asset in market:
-                    total_factor += factor
-                    count += 1
-                    break
-        
-        return total_factor / count if count > 0 else 0
-    
-    def _analyze_borrowing_behavior(self, wallet_txs: pd.DataFrame) -> str:
+    def _analyze_borrowing_behavior(self, wallet_stats: pd.DataFrame) -> pd.Series:
         """
         Analyze borrowing behavior patterns
         """
-        if wallet_txs.empty:
-            return 'none'
-        
-        # Count different types of transactions
-        supply_count = len(wallet_txs[wallet_txs['market'].str.contains('mint|supply', case=False, na=False)])
-        borrow_count = len(wallet_txs[wallet_txs['market'].str.contains('borrow', case=False, na=False)])
-        repay_count = len(wallet_txs[wallet_txs['market'].str.contains('repay', case=False, na=False)])
-        
-        if borrow_count == 0:
-            return 'supplier_only'
-        elif supply_count == 0:
-            return 'borrower_only'
-        elif repay_count / max(borrow_count, 1) > 0.8:
-            return 'responsible_borrower'
-        else:
-            return 'risky_borrower'
+        supply_count = wallet_stats['supply_count']
+        borrow_count = wallet_stats['borrow_count']
+        repay_count = wallet_stats['repay_count']
+        
+        behavior = np.select(
+            [borrow_count == 0, supply_count == 0, repay_count / borrow_count.clip(lower=1) > 0.8],
+            ['supplier_only', 'borrower_only', 'responsible_borrower'],
+            default='risky_borrower'
+        )
+        return pd.Series(behavior, index=wallet_stats.index)
     
-    def _calculate_health_factor_trend(self, wallet_txs: pd.DataFrame) -> str:
+    def _calculate_health_factor_trend(self, txs: pd.DataFrame) -> pd.Series:
         """
         Calculate health factor trend (simplified)
         """
-        if wallet_txs.empty:
-            return 'unknown'
-        
         # Simplified health factor calculation
         # In production, you'd calculate actual health factors over time
         
-        recent_txs = wallet_txs.tail(10)  # Last 10 transactions
-        older_txs = wallet_txs.head(max(1, len(wallet_txs) - 10))  # Earlier transactions
-        
-        recent_volatility = self._calculate_volatile_asset_usage(recent_txs)
-        older_volatility = self._calculate_volatile_asset_usage(older_txs)
-        
-        if recent_volatility < older_volatility:
-            return 'improving'
-        elif recent_volatility > older_volatility:
-            return 'deteriorating'
-        else:
-            return 'stable'
+        # Compare volatile usage in each wallet's last 10 transactions
+        # against its earlier transactions
+        grouped = txs.groupby('wallet', sort=False, observed=True)
+        position = grouped.cumcount()
+        size = grouped['wallet'].transform('size')
+        
+        is_recent = position >= size - 10
+        is_older = position < np.maximum(1, size - 10)
+        
+        # Both window means come from the cached is_volatile column in one grouped reduction
+        volatility = pd.DataFrame({
+            'recent': txs['is_volatile'].where(is_recent),
+            'older': txs['is_volatile'].where(is_older)
+        }).astype(float).groupby(txs['wallet'], sort=False, observed=True).mean()
+        recent_volatility = volatility['recent']
+        older_volatility = volatility['older']
+        
+        trend = np.select(
+            [recent_volatility < older_volatility, recent_volatility > older_volatility],
+            ['improving', 'deteriorating'],
+            default='stable'
+        )
+        return pd.Series(trend, index=recent_volatility.index)
     
     def extract_all_wallet_features(self, transactions_df: pd.DataFrame, wallet_addresses: List[str]) -> pd.DataFrame:
         """
-        Extract features for all wallets
+        Extract features for all wallets in a single grouped pass
         """
-        all_features = []
+        if transactions_df.empty:
+            defaults = [self._get_default_features(wallet) for wallet in wallet_addresses]
+            return pd.DataFrame.from_records(defaults, columns=[c for c, _ in FEATURE_COLUMNS]).astype(dict(FEATURE_COLUMNS))
+        
+        txs = self._add_indicator_columns(transactions_df)
+        
+        wallet_stats = txs.groupby('wallet', sort=False, observed=True).agg(
+            total_transactions=('wallet', 'size'),
+            first_transaction_date=('timestamp', 'min'),
+            last_transaction_date=('timestamp', 'max'),
+            lending_events=('is_lending_market', 'sum'),
+            number_of_liquidations=('is_liquidation', 'sum'),
+            repay_count=('is_repay', 'sum'),
+            volatile_asset_usage=('is_volatile', 'mean'),
+            v2_count=('is_v2', 'sum'),
+            v3_count=('is_v3', 'sum'),
+            collateral_factor_average=('collateral_factor', 'mean'),
+            supply_count=('is_supply', 'sum'),
+            borrow_count=('is_borrow', 'sum')
+        )
+        
+        features = pd.DataFrame({
+            'wallet_id': wallet_stats.index,
+            'total_transactions': wallet_stats['total_transactions'],
+            'first_transaction_date': wallet_stats['first_transaction_date'],
+            'last_transaction_date': wallet_stats['last_transaction_date'],
+            'days_since_last_activity': self._calculate_inactivity_days(wallet_stats),
+            'total_supplied_usd': self._calculate_total_supplied(wallet_stats),
+            'total_borrowed_usd': self._calculate_total_borrowed(wallet_stats),
+            'supply_to_borrow_ratio': 0.0,
+            'number_of_liquidations': wallet_stats['number_of_liquidations'],
+            'repayment_frequency': self._calculate_repayment_frequency(wallet_stats),
+            'volatile_asset_usage': wallet_stats['volatile_asset_usage'],
+            'protocol_version_usage': self._determine_protocol_version(wallet_stats),
+            'collateral_factor_average': wallet_stats['collateral_factor_average'].fillna(0),
+            'borrowing_behavior': self._analyze_borrowing_behavior(wallet_stats),
+            'health_factor_trend': self._calculate_health_factor_trend(txs)
+        }, index=wallet_stats.index)
+        
+        # Calculate supply to borrow ratio
+        supplied = features['total_supplied_usd']
+        features['supply_to_borrow_ratio'] = (features['total_borrowed_usd'] / supplied).where(supplied > 0, 0.0)
+        
+        # Keep the caller's wallet order; wallets with no transactions get default features
+        features = features.reindex(wallet_addresses)
+        missing = ~features.index.isin(wallet_stats.index)
+        for column, value in self._get_default_features(None).items():
+            if value is not None:  # first/last dates stay NaT
+                features.loc[missing, column] = value
+        features['wallet_id'] = wallet_addresses
         
-        for wallet in wallet_addresses:
-            features = self.extract_wallet_features(transactions_df, wallet)
-            all_features.append(features)
+        features = features.astype(dict(FEATURE_COLUMNS))
         
-        return pd.DataFrame(all_features) 
\ No newline at end of file
+        return features.reset_index(drop=True) 
\ No newline at end of file
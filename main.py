@@ -8,12 +8,21 @@ import pandas as pd
 import numpy as np
 import time
 import os
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from datetime import datetime
 from data_collector import CompoundDataCollector
 from feature_extractor import FeatureExtractor
 from risk_scorer import RiskScorer
 from config import *
 
+# Simulated markets and their addresses; V2 addresses take precedence on a name clash
+_ALL_MARKETS = np.array(list(COMPOUND_V2_MARKETS) + list(COMPOUND_V3_MARKETS))
+_MARKET_ADDRESS = {**COMPOUND_V3_MARKETS, **COMPOUND_V2_MARKETS}
+
+# Shared random generator for the simulator
+_RNG = np.random.default_rng()
+
 def load_wallet_addresses(sheet_url: str = None) -> list:
     """
     Load wallet addresses from Google Sheets or use sample data
@@ -21,11 +30,14 @@ def load_wallet_addresses(sheet_url: str = None) -> list:
     from sheet_parser import load_wallets_from_sheet
     
     if sheet_url:
-        return load_wallets_from_sheet(sheet_url)
+        raw_wallets = load_wallets_from_sheet(sheet_url)
     else:
         # Use the provided Google Sheets URL
         default_url = "https://docs.google.com/spreadsheets/d/1ZzaeMgNYnxvriYYpe8PE7uMEblTI0GV5GIVUnsP-sBs/edit?usp=sharing"
-        return load_wallets_from_sheet(default_url)
+        raw_wallets = load_wallets_from_sheet(default_url)
+    
+    # Addresses are case-insensitive; drop repeats so each wallet is scored once, keeping sheet order
+    return list(dict.fromkeys(wallet.lower() for wallet in raw_wallets))
 
 def main():
     """
@@ -70,7 +82,7 @@ def main():
     
     # Save CSV file
     output_filename = f"wallet_risk_scores_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    scores_df.to_csv(output_filename, index=False)
+    save_scores(scores_df, output_filename)
     print(f"Saved risk scores to: {output_filename}")
     
     # Generate summary
@@ -94,39 +106,67 @@ def create_simulated_transactions(wallet_addresses: list) -> pd.DataFrame:
     """
     Create simulated transaction data for demonstration purposes
     """
-    transactions = []
-    
-    for wallet in wallet_addresses:
-        # Generate random number of transactions for each wallet
-        num_transactions = np.random.randint(1, 20)
-        
-        for i in range(num_transactions):
-            # Random transaction type
-            tx_types = ['supply', 'borrow', 'repay', 'withdraw', 'liquidation']
-            tx_type = np.random.choice(tx_types, p=[0.3, 0.3, 0.2, 0.15, 0.05])
-            
-            # Random market
-            markets = list(COMPOUND_V2_MARKETS.keys()) + list(COMPOUND_V3_MARKETS.keys())
-            market = np.random.choice(markets)
-            
-            # Random timestamp within last year
-            days_ago = np.random.randint(0, 365)
-            timestamp = datetime.now() - pd.Timedelta(days=days_ago)
-            
-            transaction = {
-                'wallet': wallet,
-                'market': market,
-                'market_address': COMPOUND_V2_MARKETS.get(market, COMPOUND_V3_MARKETS.get(market, '')),
-                'block_number': np.random.randint(15000000, 18000000),
-                'transaction_hash': f"0x{np.random.bytes(32).hex()}",
-                'log_index': i,
-                'topics': [f"0x{np.random.bytes(32).hex()}"],
-                'data': f"0x{np.random.bytes(64).hex()}",
-                'timestamp': timestamp
-            }
-            transactions.append(transaction)
-    
-    return pd.DataFrame(transactions)
+    # Random number of transactions for each wallet, drawn for all wallets at once
+    counts = _RNG.integers(1, 20, size=len(wallet_addresses))
+    total = int(counts.sum())
+    
+    # Random transaction type (supply, borrow, repay, withdraw, liquidation)
+    tx_types = ['mint', 'borrow', 'repay', 'redeem', 'liquidate']
+    tx_type = _RNG.choice(tx_types, size=total, p=[0.3, 0.3, 0.2, 0.15, 0.05])
+    
+    # Random market
+    market = _RNG.choice(_ALL_MARKETS, size=total)
+    
+    # Random timestamp within last year
+    days_ago = _RNG.integers(0, 365, size=total)
+    timestamp = pd.Timestamp(datetime.now()) - pd.to_timedelta(days_ago, unit='D')
+    
+    # One random draw for all hashes, topics and data: 32 + 32 + 64 bytes per transaction,
+    # i.e. 256 hex characters per row
+    hexed = _RNG.bytes(total * 128).hex()
+    rows = [hexed[i:i + 256] for i in range(0, len(hexed), 256)]
+    
+    # Log index counts up within each wallet
+    log_index = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    
+    transactions_df = pd.DataFrame({
+        'wallet': np.repeat(np.array(wallet_addresses, dtype=object), counts),
+        'market': market,
+        'market_address': pd.Series(market).map(_MARKET_ADDRESS).fillna(''),
+        'block_number': _RNG.integers(15000000, 18000000, size=total),
+        'transaction_hash': ['0x' + row[:64] for row in rows],
+        'log_index': log_index,
+        'topics': [['0x' + row[64:128]] for row in rows],
+        'data': ['0x' + row[128:] for row in rows],
+        'event_type': tx_type,
+        'timestamp': timestamp
+    })
+    
+    # Use the same categorical columns as collect_all_wallet_data so simulated
+    # runs exercise the feature extractor on the dtypes it sees in production
+    for column in ('market', 'wallet', 'event_type'):
+        transactions_df[column] = transactions_df[column].astype('category')
+    
+    return transactions_df
+
+def save_scores(scores_df: pd.DataFrame, output_filename: str):
+    """
+    Write risk scores as CSV through PyArrow's writer, plus a Parquet copy
+    """
+    try:
+        # Same unquoted layout as DataFrame.to_csv; the header goes in by hand
+        # since PyArrow always quotes column names
+        with open(output_filename, 'wb') as f:
+            f.write((','.join(scores_df.columns) + '\n').encode())
+            pa_csv.write_csv(
+                pa.Table.from_pandas(scores_df, preserve_index=False), f,
+                write_options=pa_csv.WriteOptions(include_header=False, quoting_style='none')
+            )
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # Values that would need quoting
+        scores_df.to_csv(output_filename, index=False)
+    
+    scores_df.to_parquet(output_filename.replace('.csv', '.parquet'), index=False)
 
 def generate_detailed_report(features_df: pd.DataFrame, scores_df: pd.DataFrame, summary: dict):
     """
@@ -134,66 +174,73 @@ def generate_detailed_report(features_df: pd.DataFrame, scores_df: pd.DataFrame,
     """
     report_filename = f"risk_analysis_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
     
+    parts = []
+    append = parts.append
+    
+    append("# Compound Protocol Wallet Risk Analysis Report\n\n")
+    append(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+    
+    append("## Executive Summary\n\n")
+    append(f"- **Total Wallets Analyzed**: {summary['total_wallets']}\n")
+    append(f"- **Average Risk Score**: {summary['average_score']:.2f}\n")
+    append(f"- **Score Range**: {summary['min_score']} - {summary['max_score']}\n\n")
+    
+    append("## Risk Distribution\n\n")
+    parts.extend(
+        f"- **{category}**: {count} wallets ({(count / summary['total_wallets']) * 100:.1f}%)\n"
+        for category, count in summary['risk_distribution'].items()
+    )
+    
+    append("\n## Methodology\n\n")
+    append("### Data Collection Method\n")
+    append("- Used Etherscan API to fetch Compound V2/V3 protocol transactions\n")
+    append("- Tracked supply, borrow, repay, withdraw, and liquidation events\n")
+    append("- Implemented rate limiting to respect API constraints\n\n")
+    
+    append("### Feature Selection & Rationale\n")
+    append("1. **Borrow-to-Supply Ratio**: Indicates leverage and risk exposure\n")
+    append("2. **Liquidation Count**: Direct indicator of past risk events\n")
+    append("3. **Inactivity Days**: Recent activity suggests active risk management\n")
+    append("4. **Repayment Frequency**: Regular repayments indicate responsible borrowing\n")
+    append("5. **Volatile Asset Usage**: Higher volatility assets increase risk\n")
+    append("6. **Protocol Version**: V3 is newer and generally safer\n")
+    append("7. **Collateral Factor**: Higher factors provide better safety margins\n\n")
+    
+    append("### Risk Scoring Algorithm\n")
+    append("- Base score of 500 (neutral)\n")
+    append("- Weighted scoring based on 7 risk components\n")
+    append("- Min-max normalization to 0-1000 scale\n")
+    append("- Higher scores indicate lower risk\n\n")
+    
+    append("### Risk Indicator Justification\n")
+    append("- **Borrow-to-Supply Ratio (25%)**: Primary risk metric for leverage\n")
+    append("- **Liquidation Count (20%)**: Historical risk event indicator\n")
+    append("- **Inactivity Days (15%)**: Activity level indicator\n")
+    append("- **Repayment Frequency (15%)**: Behavioral risk indicator\n")
+    append("- **Volatile Asset Usage (10%)**: Asset-specific risk\n")
+    append("- **Protocol Version (10%)**: Technology risk\n")
+    append("- **Collateral Factor (5%)**: Safety margin indicator\n\n")
+    
+    append("### Scalability Considerations\n")
+    append("- Modular architecture allows easy scaling\n")
+    append("- Batch processing for large wallet lists\n")
+    append("- Caching mechanisms for repeated queries\n")
+    append("- Parallel processing capabilities\n")
+    append("- API rate limiting and retry logic\n\n")
+    
+    # One sort serves both lists: lowest scores from the head, highest from the tail
+    sorted_scores = scores_df.sort_values('score', kind='stable')
+    lines = '- ' + sorted_scores['wallet_id'].astype(str) + ': ' + sorted_scores['score'].astype(str) + '\n'
+    
+    append("## Top 10 Highest Risk Wallets\n\n")
+    parts.extend(lines.head(10))
+    
+    append("\n## Top 10 Lowest Risk Wallets\n\n")
+    parts.extend(lines.tail(10).iloc[::-1])
+    
+    # Assemble the report in memory and write it out once
     with open(report_filename, 'w') as f:
-        f.write("# Compound Protocol Wallet Risk Analysis Report\n\n")
-        f.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        
-        f.write("## Executive Summary\n\n")
-        f.write(f"- **Total Wallets Analyzed**: {summary['total_wallets']}\n")
-        f.write(f"- **Average Risk Score**: {summary['average_score']:.2f}\n")
-        f.write(f"- **Score Range**: {summary['min_score']} - {summary['max_score']}\n\n")
-        
-        f.write("## Risk Distribution\n\n")
-        for category, count in summary['risk_distribution'].items():
-            percentage = (count / summary['total_wallets']) * 100
-            f.write(f"- **{category}**: {count} wallets ({percentage:.1f}%)\n")
-        
-        f.write("\n## Methodology\n\n")
-        f.write("### Data Collection Method\n")
-        f.write("- Used Etherscan API to fetch Compound V2/V3 protocol transactions\n")
-        f.write("- Tracked supply, borrow, repay, withdraw, and liquidation events\n")
-        f.write("- Implemented rate limiting to respect API constraints\n\n")
-        
-        f.write("### Feature Selection & Rationale\n")
-        f.write("1. **Borrow-to-Supply Ratio**: Indicates leverage and risk exposure\n")
-        f.write("2. **Liquidation Count**: Direct indicator of past risk events\n")
-        f.write("3. **Inactivity Days**: Recent activity suggests active risk management\n")
-        f.write("4. **Repayment Frequency**: Regular repayments indicate responsible borrowing\n")
-        f.write("5. **Volatile Asset Usage**: Higher volatility assets increase risk\n")
-        f.write("6. **Protocol Version**: V3 is newer and generally safer\n")
-        f.write("7. **Collateral Factor**: Higher factors provide better safety margins\n\n")
-        
-        f.write("### Risk Scoring Algorithm\n")
-        f.write("- Base score of 500 (neutral)\n")
-        f.write("- Weighted scoring based on 7 risk components\n")
-        f.write("- Min-max normalization to 0-1000 scale\n")
-        f.write("- Higher scores indicate lower risk\n\n")
-        
-        f.write("### Risk Indicator Justification\n")
-        f.write("- **Borrow-to-Supply Ratio (25%)**: Primary risk metric for leverage\n")
-        f.write("- **Liquidation Count (20%)**: Historical risk event indicator\n")
-        f.write("- **Inactivity Days (15%)**: Activity level indicator\n")
-        f.write("- **Repayment Frequency (15%)**: Behavioral risk indicator\n")
-        f.write("- **Volatile Asset Usage (10%)**: Asset-specific risk\n")
-        f.write("- **Protocol Version (10%)**: Technology risk\n")
-        f.write("- **Collateral Factor (5%)**: Safety margin indicator\n\n")
-        
-        f.write("### Scalability Considerations\n")
-        f.write("- Modular architecture allows easy scaling\n")
-        f.write("- Batch processing for large wallet lists\n")
-        f.write("- Caching mechanisms for repeated queries\n")
-        f.write("- Parallel processing capabilities\n")
-        f.write("- API rate limiting and retry logic\n\n")
-        
-        f.write("## Top 10 Highest Risk Wallets\n\n")
-        top_risky = scores_df.nsmallest(10, 'score')
-        for _, row in top_risky.iterrows():
-            f.write(f"- {row['wallet_id']}: {row['score']}\n")
-        
-        f.write("\n## Top 10 Lowest Risk Wallets\n\n")
-        top_safe = scores_df.nlargest(10, 'score')
-        for _, row in top_safe.iterrows():
-            f.write(f"- {row['wallet_id']}: {row['score']}\n")
+        f.write(''.join(parts))
     
     print(f"Generated detailed report: {report_filename}")
 
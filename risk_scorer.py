@@ -1,8 +1,73 @@
+import os
 import pandas as pd
 import numpy as np
+from joblib import Parallel, delayed
 from typing import Dict, List, Tuple
-from sklearn.preprocessing import MinMaxScaler
 from config import *
+from _score_kernel import score_kernel, VERSION_NONE, VERSION_V2, VERSION_V3, VERSION_UNKNOWN
+
+# Risk components in scoring order
+RISK_COMPONENTS = [
+    'borrow_supply_ratio', 'liquidation_count', 'inactivity_days', 'repayment_frequency',
+    'volatile_asset_usage', 'protocol_version', 'collateral_factor'
+]
+
+# Feature values assumed when a wallet's feature is missing or NaN
+_FEATURE_DEFAULTS = {
+    'supply_to_borrow_ratio': 0,
+    'number_of_liquidations': 0,
+    'days_since_last_activity': 365,
+    'repayment_frequency': 0,
+    'volatile_asset_usage': 0,
+    'protocol_version_usage': 'none',
+    'collateral_factor_average': 0
+}
+
+def _feature_value(features: Dict, name: str):
+    """
+    Feature value with missing and NaN entries replaced by the default, like fillna
+    """
+    value = features.get(name)
+    return _FEATURE_DEFAULTS[name] if value is None or value != value else value
+
+# Protocol version codes for the single-wallet kernel
+_VERSION_CODES = {'none': VERSION_NONE, 'v2': VERSION_V2, 'v3': VERSION_V3}
+
+# Scoring rules as sorted bin edges and one score per bin. "<=" ladders look
+# up with side='left' so edges are inclusive upper bounds, ">=" ladders with
+# side='right' so edges are inclusive lower bounds
+
+# Borrow to supply ratio: <=0.3 very low risk ... >0.9 very high risk (0 handled separately)
+_BSR_THRESHOLDS = np.array([0.3, 0.5, 0.7, 0.9])
+_BSR_SCORES = np.array([100, 50, 0, -50, -100])
+
+# Liquidations: none, one, two, up to five, many
+_LIQUIDATION_THRESHOLDS = np.array([0, 1, 2, 5])
+_LIQUIDATION_SCORES = np.array([50, -25, -50, -75, -100])
+
+# Days since last activity: a week, a month, a quarter, half a year, longer
+_INACTIVITY_THRESHOLDS = np.array([7, 30, 90, 180])
+_INACTIVITY_SCORES = np.array([50, 25, 0, -25, -50])
+
+# Repayments per month: infrequent, moderate, frequent, very frequent (<=0 handled separately)
+_REPAYMENT_THRESHOLDS = np.array([0.5, 1.0, 2.0])
+_REPAYMENT_SCORES = np.array([-25, 0, 25, 50])
+
+# Share of volatile asset transactions
+_VOLATILE_THRESHOLDS = np.array([0.1, 0.3, 0.5, 0.7])
+_VOLATILE_SCORES = np.array([50, 25, 0, -25, -50])
+
+# Average collateral factor
+_COLLATERAL_THRESHOLDS = np.array([0.4, 0.6, 0.8])
+_COLLATERAL_SCORES = np.array([-50, -25, 0, 25])
+
+# Protocol version, indexed by categorical code in the same order as the kernel's version codes
+_VER_CATS = pd.CategoricalDtype(['none', 'v2', 'v3', 'unknown'])
+_VER_SCORES = np.array([-25, 0, 25, 0], dtype=np.int16)
+
+# Risk categories as left-closed score bins, from highest to lowest risk
+_RISK_BINS = [-np.inf, 200, 400, 600, 800, np.inf]
+_RISK_LABELS = ['Very High Risk', 'High Risk', 'Moderate Risk', 'Low Risk', 'Very Low Risk']
 
 class RiskScorer:
     """
@@ -11,180 +76,135 @@ class RiskScorer:
     
     def __init__(self):
         self.weights = RISK_WEIGHTS
-        self.scaler = MinMaxScaler()
+        # Component weights in the order score_kernel expects
+        self.component_weights = np.array([self.weights.get(c, 0) for c in RISK_COMPONENTS], dtype=float)
         
     def calculate_risk_score(self, features: Dict) -> int:
         """
         Calculate risk score (0-1000) for a single wallet
         """
-        # Initialize base score
-        base_score = 500  # Start with neutral score
-        
-        # Calculate individual risk components
-        risk_components = {
-            'borrow_supply_ratio': self._score_borrow_supply_ratio(features),
-            'liquidation_count': self._score_liquidation_count(features),
-            'inactivity_days': self._score_inactivity_days(features),
-            'repayment_frequency': self._score_repayment_frequency(features),
-            'volatile_asset_usage': self._score_volatile_asset_usage(features),
-            'protocol_version': self._score_protocol_version(features),
-            'collateral_factor': self._score_collateral_factor(features)
-        }
+        version = _feature_value(features, 'protocol_version_usage')
         
-        # Apply weighted scoring
-        weighted_score = 0
-        for component, score in risk_components.items():
-            weight = self.weights.get(component, 0)
-            weighted_score += score * weight
-        
-        # Calculate final score
-        final_score = base_score + weighted_score
-        
-        # Ensure score is within 0-1000 range
-        final_score = max(0, min(1000, final_score))
-        
-        return int(final_score)
+        return score_kernel(
+            float(_feature_value(features, 'supply_to_borrow_ratio')),
+            float(_feature_value(features, 'number_of_liquidations')),
+            float(_feature_value(features, 'days_since_last_activity')),
+            float(_feature_value(features, 'repayment_frequency')),
+            float(_feature_value(features, 'volatile_asset_usage')),
+            _VERSION_CODES.get(version, VERSION_UNKNOWN),
+            float(_feature_value(features, 'collateral_factor_average')),
+            self.component_weights
+        )
     
-    def _score_borrow_supply_ratio(self, features: Dict) -> float:
+    @staticmethod
+    def _borrow_supply_ratio_scores(ratio) -> np.ndarray:
         """
-        Score based on borrow to supply ratio
-        Lower ratio = lower risk = higher score
+        Bin lookup for borrow to supply ratio scores
         """
-        ratio = features.get('supply_to_borrow_ratio', 0)
-        
-        if ratio == 0:
-            return 0  # No borrowing activity
-        elif ratio <= 0.3:
-            return 100  # Very low risk
-        elif ratio <= 0.5:
-            return 50   # Low risk
-        elif ratio <= 0.7:
-            return 0    # Moderate risk
-        elif ratio <= 0.9:
-            return -50  # High risk
-        else:
-            return -100 # Very high risk
+        ratio = np.asarray(ratio, dtype=float)
+        scores = _BSR_SCORES[np.searchsorted(_BSR_THRESHOLDS, ratio, side='left')]
+        return np.where(ratio == 0, 0, scores)  # No borrowing activity
     
-    def _score_liquidation_count(self, features: Dict) -> float:
+    @staticmethod
+    def _liquidation_count_scores(liquidations) -> np.ndarray:
         """
-        Score based on liquidation history
-        Fewer liquidations = lower risk = higher score
+        Bin lookup for liquidation count scores
         """
-        liquidations = features.get('number_of_liquidations', 0)
-        
-        if liquidations == 0:
-            return 50   # No liquidations
-        elif liquidations == 1:
-            return -25  # One liquidation
-        elif liquidations == 2:
-            return -50  # Two liquidations
-        elif liquidations <= 5:
-            return -75  # Multiple liquidations
-        else:
-            return -100 # Many liquidations
+        liquidations = np.asarray(liquidations, dtype=float)
+        return _LIQUIDATION_SCORES[np.searchsorted(_LIQUIDATION_THRESHOLDS, liquidations, side='left')]
     
-    def _score_inactivity_days(self, features: Dict) -> float:
+    @staticmethod
+    def _inactivity_days_scores(inactivity_days) -> np.ndarray:
         """
-        Score based on days since last activity
-        Recent activity = lower risk = higher score
+        Bin lookup for inactivity scores
         """
-        inactivity_days = features.get('days_since_last_activity', 365)
-        
-        if inactivity_days <= 7:
-            return 50   # Very recent activity
-        elif inactivity_days <= 30:
-            return 25   # Recent activity
-        elif inactivity_days <= 90:
-            return 0    # Moderate inactivity
-        elif inactivity_days <= 180:
-            return -25  # Long inactivity
-        else:
-            return -50  # Very long inactivity
+        inactivity_days = np.asarray(inactivity_days, dtype=float)
+        return _INACTIVITY_SCORES[np.searchsorted(_INACTIVITY_THRESHOLDS, inactivity_days, side='left')]
     
-    def _score_repayment_frequency(self, features: Dict) -> float:
+    @staticmethod
+    def _repayment_frequency_scores(frequency) -> np.ndarray:
         """
-        Score based on repayment frequency
-        Higher frequency = lower risk = higher score
+        Bin lookup for repayment frequency scores
         """
-        frequency = features.get('repayment_frequency', 0)
-        
-        if frequency >= 2.0:
-            return 50   # Very frequent repayments
-        elif frequency >= 1.0:
-            return 25   # Frequent repayments
-        elif frequency >= 0.5:
-            return 0    # Moderate repayments
-        elif frequency > 0:
-            return -25  # Infrequent repayments
-        else:
-            return -50  # No repayments
+        frequency = np.asarray(frequency, dtype=float)
+        scores = _REPAYMENT_SCORES[np.searchsorted(_REPAYMENT_THRESHOLDS, frequency, side='right')]
+        return np.where(frequency > 0, scores, -50)  # No repayments
     
-    def _score_volatile_asset_usage(self, features: Dict) -> float:
+    @staticmethod
+    def _volatile_asset_usage_scores(volatile_usage) -> np.ndarray:
         """
-        Score based on volatile asset usage
-        Lower usage = lower risk = higher score
+        Bin lookup for volatile asset usage scores
         """
-        volatile_usage = features.get('volatile_asset_usage', 0)
-        
-        if volatile_usage <= 0.1:
-            return 50   # Very low volatile asset usage
-        elif volatile_usage <= 0.3:
-            return 25   # Low volatile asset usage
-        elif volatile_usage <= 0.5:
-            return 0    # Moderate volatile asset usage
-        elif volatile_usage <= 0.7:
-            return -25  # High volatile asset usage
-        else:
-            return -50  # Very high volatile asset usage
+        volatile_usage = np.asarray(volatile_usage, dtype=float)
+        return _VOLATILE_SCORES[np.searchsorted(_VOLATILE_THRESHOLDS, volatile_usage, side='left')]
     
-    def _score_protocol_version(self, features: Dict) -> float:
+    @staticmethod
+    def _protocol_version_scores(version: pd.Series) -> np.ndarray:
         """
-        Score based on protocol version usage
-        V3 = lower risk = higher score
+        Lookup for protocol version scores
         """
-        version = features.get('protocol_version_usage', 'none')
-        
-        if version == 'v3':
-            return 25   # V3 is newer and generally safer
-        elif version == 'v2':
-            return 0    # V2 is stable but older
-        elif version == 'none':
-            return -25  # No protocol usage
-        else:
-            return 0    # Unknown version
+        # Versions outside the fixed categories get code -1 and score as unknown
+        codes = _VER_CATS.categories.get_indexer(version)
+        return _VER_SCORES[np.where(codes < 0, 3, codes)]
     
-    def _score_collateral_factor(self, features: Dict) -> float:
+    @staticmethod
+    def _collateral_factor_scores(collateral_factor) -> np.ndarray:
         """
-        Score based on average collateral factor
-        Higher factor = lower risk = higher score
+        Bin lookup for collateral factor scores
         """
-        collateral_factor = features.get('collateral_factor_average', 0)
-        
-        if collateral_factor >= 0.8:
-            return 25   # High collateral factor
-        elif collateral_factor >= 0.6:
-            return 0    # Moderate collateral factor
-        elif collateral_factor >= 0.4:
-            return -25  # Low collateral factor
-        else:
-            return -50  # Very low collateral factor
+        collateral_factor = np.asarray(collateral_factor, dtype=float)
+        scores = _COLLATERAL_SCORES[np.searchsorted(_COLLATERAL_THRESHOLDS, collateral_factor, side='right')]
+        return np.where(np.isnan(collateral_factor), -50, scores)  # Missing reads as very low
     
     def score_all_wallets(self, features_df: pd.DataFrame) -> pd.DataFrame:
         """
-        Calculate risk scores for all wallets
+        Calculate risk scores for all wallets, splitting large sets across cores
         """
-        scores = []
+        n_jobs = os.cpu_count() or 1
+        if len(features_df) < PARALLEL_SCORING_MIN_WALLETS or n_jobs == 1:
+            return self._score_chunk(features_df)
         
-        for _, row in features_df.iterrows():
-            features = row.to_dict()
-            score = self.calculate_risk_score(features)
-            
-            scores.append({
-                'wallet_id': features['wallet_id'],
-                'score': score
-            })
+        # Ship only the columns scoring reads to the workers, in contiguous row blocks
+        columns = features_df[['wallet_id', *_FEATURE_DEFAULTS]]
+        chunks = [columns.iloc[rows] for rows in np.array_split(np.arange(len(columns)), n_jobs)]
+        parts = Parallel(n_jobs=n_jobs, backend='loky')(delayed(self._score_chunk)(chunk) for chunk in chunks)
         
-        return pd.DataFrame(scores)
+        return pd.concat(parts, ignore_index=True)
+    
+    def _score_chunk(self, features_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Calculate risk scores for a block of wallets in one vectorized pass
+        """
+        # Missing feature values take the same defaults as calculate_risk_score
+        risk_components = self._score_components(features_df.fillna(_FEATURE_DEFAULTS))
+        
+        # Apply weighted scoring in the same order as calculate_risk_score
+        weighted_score = np.zeros(len(features_df))
+        for component, score in risk_components.items():
+            weight = self.weights.get(component, 0)
+            weighted_score += score * weight
+        
+        # Base score of 500, clipped to the 0-1000 range
+        final_score = np.clip(500 + weighted_score, 0, 1000).astype(np.int32)
+        
+        return pd.DataFrame({
+            'wallet_id': features_df['wallet_id'].values,
+            'score': final_score
+        })
+    
+    def _score_components(self, features_df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+        Column-wise scores for each risk component, in RISK_COMPONENTS order
+        """
+        return {
+            'borrow_supply_ratio': self._borrow_supply_ratio_scores(features_df['supply_to_borrow_ratio']),
+            'liquidation_count': self._liquidation_count_scores(features_df['number_of_liquidations']),
+            'inactivity_days': self._inactivity_days_scores(features_df['days_since_last_activity']),
+            'repayment_frequency': self._repayment_frequency_scores(features_df['repayment_frequency']),
+            'volatile_asset_usage': self._volatile_asset_usage_scores(features_df['volatile_asset_usage']),
+            'protocol_version': self._protocol_version_scores(features_df['protocol_version_usage']),
+            'collateral_factor': self._collateral_factor_scores(features_df['collateral_factor_average'])
+        }
     
     def normalize_scores(self, scores_df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -193,14 +213,15 @@ class RiskScorer:
         if scores_df.empty:
             return scores_df
         
-        # Extract scores for normalization
-        scores = scores_df['score'].values.reshape(-1, 1)
+        scores = scores_df['score'].to_numpy()
+        min_score, max_score = scores.min(), scores.max()
         
-        # Apply min-max scaling to 0-1000 range
-        normalized_scores = self.scaler.fit_transform(scores) * 1000
+        # Min-max scale to the 0-1000 range; a constant column scales to 0
+        scale = 1.0 / (max_score - min_score) if max_score != min_score else 1.0
+        normalized_scores = (scores * scale - min_score * scale) * 1000
         
         # Update the dataframe
-        scores_df['score'] = normalized_scores.astype(int)
+        scores_df['score'] = normalized_scores.astype(np.int32)
         
         return scores_df
     
@@ -228,6 +249,10 @@ class RiskScorer:
         
         scores = scores_df['score'].values
         
+        # One binning pass, reported from lowest to highest risk
+        categories = pd.cut(scores, bins=_RISK_BINS, labels=_RISK_LABELS, right=False)
+        distribution = categories.value_counts().reindex(_RISK_LABELS[::-1])
+        
         summary = {
             'total_wallets': len(scores),
             'average_score': np.mean(scores),
@@ -235,13 +260,7 @@ class RiskScorer:
             'std_score': np.std(scores),
             'min_score': np.min(scores),
             'max_score': np.max(scores),
-            'risk_distribution': {
-                'Very Low Risk': len(scores[scores >= 800]),
-                'Low Risk': len(scores[(scores >= 600) & (scores < 800)]),
-                'Moderate Risk': len(scores[(scores >= 400) & (scores < 600)]),
-                'High Risk': len(scores[(scores >= 200) & (scores < 400)]),
-                'Very High Risk': len(scores[scores < 200])
-            }
+            'risk_distribution': {label: int(count) for label, count in distribution.items()}
         }
         
         return summary 
\ No newline at end of file
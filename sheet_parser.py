@@ -1,8 +1,19 @@
+import io
+import csv
 import requests
-import pandas as pd
-from typing import List
+from typing import List, Tuple
+from functools import lru_cache
 import re
 
+# Ethereum address: 0x followed by 40 hex characters
+_ETH_ADDR_RE = re.compile(r'0x[a-fA-F0-9]{40}')
+
+# Sheet ID segment of a Google Sheets URL
+_SHEET_ID_RE = re.compile(r'/spreadsheets/d/([a-zA-Z0-9-_]+)')
+
+# Parsed sheets by sheet ID: (ETag, wallet addresses), revalidated with If-None-Match
+_SHEET_CACHE = {}
+
 def parse_google_sheet(sheet_url: str) -> List[str]:
     """
     Parse wallet addresses from Google Sheets URL
@@ -20,26 +31,38 @@ def parse_google_sheet(sheet_url: str) -> List[str]:
         # Convert to CSV export URL
         csv_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv"
         
-        # Download the CSV data
-        response = requests.get(csv_url)
-        response.raise_for_status()
-        
-        # Parse CSV data
-        from io import StringIO
-        df = pd.read_csv(StringIO(response.text))
+        # Ask for the export only if it changed since the cached copy
+        cached = _SHEET_CACHE.get(sheet_id)
+        headers = {'If-None-Match': cached[0]} if cached else {}
         
-        # Extract wallet addresses (assuming they're in the first column)
-        wallet_addresses = []
+        # Stream the CSV row by row instead of buffering the whole export
+        with requests.get(csv_url, headers=headers, stream=True) as response:
+            if cached and response.status_code == 304:
+                return list(cached[1])
+            
+            response.raise_for_status()
+            
+            # Read the raw stream so quoted cells may span lines; undo gzip first
+            response.raw.decode_content = True
+            reader = csv.reader(io.TextIOWrapper(response.raw, encoding='utf-8', newline=''))
+            next(reader, None)  # Header row
+            
+            # Extract wallet addresses (assuming they're in the first column)
+            wallet_addresses = []
+            
+            for row in reader:
+                # Get the first non-empty value from the row
+                for cell in row:
+                    address = cell.strip()
+                    if address:
+                        # Validate Ethereum address format
+                        if is_valid_ethereum_address(address):
+                            wallet_addresses.append(address)
+                        break
         
-        for _, row in df.iterrows():
-            # Get the first non-empty value from the row
-            for value in row.values:
-                if pd.notna(value) and str(value).strip():
-                    address = str(value).strip()
-                    # Validate Ethereum address format
-                    if is_valid_ethereum_address(address):
-                        wallet_addresses.append(address)
-                    break
+        etag = response.headers.get('ETag')
+        if etag:
+            _SHEET_CACHE[sheet_id] = (etag, tuple(wallet_addresses))
         
         return wallet_addresses
         
@@ -47,13 +70,12 @@ def parse_google_sheet(sheet_url: str) -> List[str]:
         print(f"Error parsing Google Sheet: {e}")
         return []
 
+@lru_cache(maxsize=32)
 def extract_sheet_id(url: str) -> str:
     """
     Extract sheet ID from Google Sheets URL
     """
-    # Pattern to match Google Sheets URL
-    pattern = r'/spreadsheets/d/([a-zA-Z0-9-_]+)'
-    match = re.search(pattern, url)
+    match = _SHEET_ID_RE.search(url)
     
     if match:
         return match.group(1)
@@ -64,9 +86,7 @@ def is_valid_ethereum_address(address: str) -> bool:
     """
     Validate Ethereum address format
     """
-    # Check if it's a valid Ethereum address (0x followed by 40 hex characters)
-    pattern = r'^0x[a-fA-F0-9]{40}$'
-    return bool(re.match(pattern, address))
+    return _ETH_ADDR_RE.fullmatch(address) is not None
 
 def load_wallets_from_sheet(sheet_url: str) -> List[str]:
     """
@@ -82,13 +102,14 @@ def load_wallets_from_sheet(sheet_url: str) -> List[str]:
         return wallets
     else:
         print("Failed to load from Google Sheets, using sample data")
-        return get_sample_wallets()
+        return list(get_sample_wallets())
 
-def get_sample_wallets() -> List[str]:
+@lru_cache(maxsize=1)
+def get_sample_wallets() -> Tuple[str, ...]:
     """
     Return sample wallet addresses for testing
     """
-    return [
+    return (
         "0xfaa0768bde629806739c3a4620656c5d26f44ef2",
         "0x742d35Cc6634C0532925a3b8D4C9db96C4b4d8b6",
         "0x1234567890123456789012345678901234567890",
@@ -109,7 +130,7 @@ def get_sample_wallets() -> List[str]:
         "0xdddddddddddddddddddddddddddddddddddddddd",
         "0xeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee",
         "0xffffffffffffffffffffffffffffffffffffffff"
-    ]
+    )
 
 if __name__ == "__main__":
     # Test the sheet parser
@@ -0,0 +1,25 @@
+import pytest
+import data_collector
+from data_collector import CompoundDataCollector
+from tests.fake_rpc import FakeRPC
+
+@pytest.fixture
+def rpc():
+    server = FakeRPC()
+    server.url = server.start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def collector(rpc, tmp_path, monkeypatch):
+    # Keep the block timestamp and transaction caches inside the test directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(data_collector, 'TRANSACTION_CACHE_DIR', str(tmp_path / 'cache'))
+    # The fake server has no rate limit to respect or backoff to wait out
+    monkeypatch.setattr(data_collector, 'RPC_RATE_LIMIT', 1000)
+    monkeypatch.setattr(data_collector, 'RPC_RETRY_BACKOFF', 0)
+
+    instance = CompoundDataCollector()
+    instance.rpc_url = rpc.url
+    yield instance
+    instance.timestamp_cache.close()
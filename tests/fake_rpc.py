@@ -0,0 +1,99 @@
+import asyncio
+import threading
+from typing import Dict, List, Optional
+from aiohttp import web
+
+class FakeRPC:
+    """
+    Minimal Ethereum JSON-RPC server for collector tests, running on a background loop
+    """
+
+    def __init__(self, logs: List[Dict] = (), head_block: int = 2000, max_block_range: Optional[int] = None):
+        self.logs = list(logs)
+        self.head_block = head_block
+        self.max_block_range = max_block_range
+        self.fail_timestamps = False
+        self.rate_limited_logs = 0  # eth_getLogs calls answered with a throttling error first
+        self.http_errors = []  # statuses returned, in order, before serving requests normally
+        self.requests = []  # (method, params) per call, batch items included
+        self.batches = 0
+
+    def timestamp(self, block_number: int) -> int:
+        return 1700000000 + block_number * 12
+
+    def handle(self, req: Dict) -> Dict:
+        method, params = req['method'], req['params']
+        self.requests.append((method, params))
+        reply = {'jsonrpc': '2.0', 'id': req['id']}
+
+        if method == 'eth_blockNumber':
+            reply['result'] = hex(self.head_block)
+        elif method == 'eth_getBlockByNumber':
+            if self.fail_timestamps:
+                reply['error'] = {'code': -32000, 'message': 'header not found'}
+            else:
+                reply['result'] = {'timestamp': hex(self.timestamp(int(params[0], 16)))}
+        elif method == 'eth_getLogs':
+            query = params[0]
+            from_block = int(query['fromBlock'], 16)
+            to_block = self.head_block if query['toBlock'] == 'latest' else int(query['toBlock'], 16)
+            if self.rate_limited_logs:
+                self.rate_limited_logs -= 1
+                reply['error'] = {'code': -32005, 'message': 'exceeded rate limit, limited to 25 requests per second'}
+            elif self.max_block_range is not None and to_block - from_block + 1 > self.max_block_range:
+                reply['error'] = {'code': -32005, 'message': 'query returned more than 10000 results'}
+            else:
+                addresses = {address.lower() for address in query['address']}
+                reply['result'] = [
+                    log for log in self.logs
+                    if from_block <= int(log['blockNumber'], 16) <= to_block and log['address'].lower() in addresses
+                ]
+        else:
+            reply['error'] = {'code': -32601, 'message': 'method not found'}
+
+        return reply
+
+    async def _serve(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if self.http_errors:
+            return web.Response(status=self.http_errors.pop(0))
+        if isinstance(body, list):
+            self.batches += 1
+            return web.json_response([self.handle(item) for item in body])
+        return web.json_response(self.handle(body))
+
+    def start(self) -> str:
+        app = web.Application()
+        app.router.add_post('/', self._serve)
+
+        self.loop = asyncio.new_event_loop()
+        self.runner = web.AppRunner(app)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        self.loop.run_until_complete(site.start())
+        port = site._server.sockets[0].getsockname()[1]
+
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        return f"http://127.0.0.1:{port}/"
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    def count(self, method: str) -> int:
+        return sum(1 for name, _ in self.requests if name == method)
+
+def make_log(address: str, block_number: int, index: int, topics: List[str], data: str = '0x') -> Dict:
+    """
+    Log entry shaped like an eth_getLogs result
+    """
+    return {
+        'address': address.lower(),
+        'blockNumber': hex(block_number),
+        'transactionHash': '0x%064x' % index,
+        'logIndex': hex(index),
+        'topics': topics,
+        'data': data
+    }
@@ -0,0 +1,158 @@
+import os
+import asyncio
+import aiohttp
+import pytest
+import pandas as pd
+import data_collector
+from data_collector import ALL_MARKETS, EVENT_TOPICS, EVENT_TYPE_BY_TOPIC, event_types_from_topics, wallet_topic
+from tests.fake_rpc import make_log
+
+WALLET = "0x742d35cc6634c0532925a3b8d4c9db96c4b4d8b6"
+OTHER_WALLET = "0xfaa0768bde629806739c3a4620656c5d26f44ef2"
+MARKET = ALL_MARKETS['cUSDC']
+
+def wallet_logs(count: int, first_block: int = 1000):
+    return [
+        make_log(MARKET, first_block + i, i, [EVENT_TOPICS[0], wallet_topic(WALLET)])
+        for i in range(count)
+    ]
+
+def cache_files():
+    directory = data_collector.TRANSACTION_CACHE_DIR
+    return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+def run(collector, method, *args):
+    async def call():
+        async with aiohttp.ClientSession() as session:
+            return await getattr(collector, method)(session, *args)
+    return asyncio.run(call())
+
+def test_collect_writes_cache_after_clean_run(rpc, collector):
+    rpc.logs = wallet_logs(3)
+
+    df = collector.collect_all_wallet_data([WALLET])
+
+    assert len(df) == 3
+    assert (df['timestamp'] > '2020-01-01').all()
+    assert collector.fetch_errors == 0
+    assert len(cache_files()) == 2
+    assert rpc.count('eth_blockNumber') == 1
+
+def test_failed_timestamp_batch_is_not_cached(rpc, collector):
+    rpc.logs = wallet_logs(3)
+    rpc.fail_timestamps = True
+
+    collector.collect_all_wallet_data([WALLET])
+
+    assert collector.fetch_errors > 0
+    assert cache_files() == []
+
+def test_log_window_is_bisected_when_provider_rejects_range(rpc, collector):
+    rpc.logs = wallet_logs(40, first_block=1000)
+    rpc.max_block_range = 64
+
+    df = collector.collect_all_wallet_data([WALLET])
+
+    assert len(df) == 40
+    assert collector.fetch_errors == 0
+    assert rpc.count('eth_getLogs') > 1
+    assert len(cache_files()) == 2
+
+def test_rate_limited_log_window_is_retried_not_bisected(rpc, collector):
+    rpc.logs = wallet_logs(3)
+    rpc.rate_limited_logs = 2
+
+    df = collector.collect_all_wallet_data([WALLET])
+
+    assert len(df) == 3
+    assert collector.fetch_errors == 0
+    # One window, sent three times: two throttled attempts, then served
+    assert rpc.count('eth_getLogs') == 3
+
+def test_server_errors_are_retried_with_backoff(rpc, collector):
+    rpc.logs = wallet_logs(3)
+    rpc.http_errors = [429, 503, 502]
+
+    df = collector.collect_all_wallet_data([WALLET])
+
+    assert len(df) == 3
+    assert collector.fetch_errors == 0
+    assert rpc.http_errors == []
+    assert len(cache_files()) == 2
+
+def test_client_errors_are_not_retried(rpc, collector):
+    rpc.http_errors = [400, 400]
+    payload = {'jsonrpc': '2.0', 'id': 1, 'method': 'eth_blockNumber', 'params': []}
+
+    with pytest.raises(aiohttp.ClientResponseError):
+        run(collector, '_post_rpc', payload)
+
+    assert rpc.http_errors == [400]
+
+def test_public_coroutine_runs_without_collect_entry_point(rpc, collector):
+    rpc.logs = wallet_logs(2)
+
+    async def fetch():
+        async with aiohttp.ClientSession() as session:
+            return await collector.get_wallet_transactions_etherscan(session, WALLET)
+
+    # Each asyncio.run gets a fresh loop; the limits must follow it
+    assert len(asyncio.run(fetch())) == 2
+    assert len(asyncio.run(fetch())) == 2
+
+def test_block_timestamps_are_batched_and_cached(rpc, collector, monkeypatch):
+    monkeypatch.setattr(data_collector, 'RPC_BATCH_SIZE', 4)
+    blocks = [1000 + i * 7 for i in range(10)] + [rpc.head_block - 1]
+
+    timestamps = run(collector, '_get_block_timestamps', blocks, rpc.head_block)
+
+    assert timestamps == {block: rpc.timestamp(block) for block in blocks}
+    assert rpc.batches == 3
+
+    # Finalized blocks come from the cache; only the one near the head is refetched
+    before = rpc.count('eth_getBlockByNumber')
+    assert run(collector, '_get_block_timestamps', blocks, rpc.head_block) == timestamps
+    assert rpc.count('eth_getBlockByNumber') - before == 1
+    # The caller's head block anchors the reorg horizon; no extra eth_blockNumber
+    assert rpc.count('eth_blockNumber') == 0
+
+def test_logs_match_wallets_in_topics_and_data(rpc, collector):
+    data_word = wallet_topic(OTHER_WALLET)[2:]
+    rpc.logs = [
+        # V3 style: account indexed in a topic
+        make_log(MARKET, 1000, 0, [EVENT_TOPICS[5], wallet_topic(WALLET)]),
+        # V2 style: account ABI-encoded in the data, mixed case in the input list
+        make_log(MARKET, 1001, 1, [EVENT_TOPICS[0]], '0x' + data_word + '0' * 64),
+        # Both wallets in one log: tagged once per wallet
+        make_log(MARKET, 1002, 2, [EVENT_TOPICS[2], wallet_topic(WALLET)], '0x' + data_word),
+        # Neither wallet
+        make_log(MARKET, 1003, 3, [EVENT_TOPICS[0], wallet_topic('0x' + '1' * 40)])
+    ]
+
+    transactions = run(collector, 'get_wallets_transactions', [WALLET, OTHER_WALLET.upper().replace('0X', '0x')])
+    matched = sorted((tx['block_number'], tx['wallet'].lower()) for tx in transactions)
+
+    assert matched == [(1000, WALLET), (1001, OTHER_WALLET), (1002, WALLET), (1002, OTHER_WALLET)]
+    assert all(tx['market'] == 'cUSDC' and tx['timestamp'] == rpc.timestamp(tx['block_number']) for tx in transactions)
+
+def test_liquidations_are_tagged_to_the_borrower_only(rpc, collector):
+    liquidator, borrower = wallet_topic(WALLET), wallet_topic(OTHER_WALLET)
+    amounts = '%064x' % 10 ** 6
+    rpc.logs = [
+        # V2 LiquidateBorrow: liquidator, borrower, repayAmount, cTokenCollateral, seizeTokens in data
+        make_log(MARKET, 1000, 0, [EVENT_TOPICS[4]], '0x' + liquidator[2:] + borrower[2:] + amounts + wallet_topic(MARKET)[2:] + amounts),
+        # V3 Liquidate with liquidator and borrower indexed
+        make_log(MARKET, 1001, 1, [EVENT_TOPICS[9], liquidator, borrower], '0x' + amounts * 3)
+    ]
+
+    transactions = run(collector, 'get_wallets_transactions', [WALLET, OTHER_WALLET])
+
+    assert sorted((tx['block_number'], tx['wallet']) for tx in transactions) == [(1000, OTHER_WALLET), (1001, OTHER_WALLET)]
+
+def test_event_types_from_topics():
+    unknown = '0x' + 'ab' * 32
+    topics = pd.Series(EVENT_TOPICS + [unknown, None])
+
+    event_types = event_types_from_topics(topics)
+
+    assert list(event_types) == list(EVENT_TYPE_BY_TOPIC.values()) + ['other', 'other']
@@ -0,0 +1,41 @@
+import pandas as pd
+from feature_extractor import FeatureExtractor
+
+def transactions(events_by_wallet):
+    rows = [
+        {'wallet': wallet, 'market': 'cUSDC', 'event_type': event, 'timestamp': pd.Timestamp('2024-01-01') + pd.Timedelta(days=i)}
+        for wallet, events in events_by_wallet.items()
+        for i, event in enumerate(events)
+    ]
+    return pd.DataFrame(rows)
+
+def test_borrowing_behavior_follows_event_types():
+    events = {
+        'supplier': ['mint', 'redeem'],
+        'borrower': ['borrow'],
+        'responsible': ['mint', 'borrow', 'repay'],
+        'risky': ['mint', 'borrow', 'borrow', 'repay'],
+    }
+
+    features = FeatureExtractor().extract_all_wallet_features(transactions(events), list(events) + ['idle'])
+    behavior = dict(zip(features['wallet_id'], features['borrowing_behavior']))
+
+    assert behavior == {
+        'supplier': 'supplier_only',
+        'borrower': 'borrower_only',
+        'responsible': 'responsible_borrower',
+        'risky': 'risky_borrower',
+        'idle': 'none',
+    }
+
+def test_categorical_event_types_match_object_columns():
+    events = {'a': ['mint', 'borrow', 'repay', 'liquidate'], 'b': ['borrow', 'mint']}
+    txs = transactions(events)
+    categorical = txs.astype({'wallet': 'category', 'market': 'category', 'event_type': 'category'})
+
+    extractor = FeatureExtractor()
+    expected = extractor.extract_all_wallet_features(txs, list(events))
+    actual = extractor.extract_all_wallet_features(categorical, list(events))
+
+    columns = ['number_of_liquidations', 'repayment_frequency', 'borrowing_behavior']
+    pd.testing.assert_frame_equal(actual[columns], expected[columns])
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import risk_scorer
+from risk_scorer import RiskScorer
+
+def random_features(count: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'wallet_id': [f'0x{i:040x}' for i in range(count)],
+        'supply_to_borrow_ratio': rng.choice([0, 0.2, 0.5, 0.8, 1.5], count),
+        'number_of_liquidations': rng.integers(0, 8, count),
+        'days_since_last_activity': rng.integers(0, 400, count),
+        'repayment_frequency': rng.choice([0, 0.3, 0.5, 1.0, 2.5], count),
+        'volatile_asset_usage': rng.random(count),
+        'protocol_version_usage': rng.choice(['none', 'v2', 'v3', 'both'], count),
+        'collateral_factor_average': rng.choice([np.nan, 0.3, 0.6, 0.9], count)
+    })
+
+def test_parallel_scoring_matches_in_process(monkeypatch):
+    features = random_features(1000)
+    scorer = RiskScorer()
+
+    # Force the joblib path on a small set
+    monkeypatch.setattr(risk_scorer, 'PARALLEL_SCORING_MIN_WALLETS', 10)
+    monkeypatch.setattr(risk_scorer.os, 'cpu_count', lambda: 2)
+
+    pd.testing.assert_frame_equal(scorer.score_all_wallets(features), scorer._score_chunk(features))
+
+def test_single_wallet_kernel_matches_batch_without_numba(monkeypatch):
+    features = random_features(200, seed=1)
+    scorer = RiskScorer()
+
+    # py_func is the undecorated kernel, the same code that runs when numba is missing
+    kernel = risk_scorer.score_kernel
+    monkeypatch.setattr(risk_scorer, 'score_kernel', getattr(kernel, 'py_func', kernel))
+
+    single = [scorer.calculate_risk_score(row) for row in features.to_dict('records')]
+    assert single == scorer._score_chunk(features)['score'].tolist()
+
+def test_risk_summary_bins_are_left_closed():
+    scores = pd.DataFrame({'score': np.array([0, 199, 200, 400, 599, 600, 800, 1000], dtype=np.int32)})
+
+    summary = RiskScorer().generate_risk_summary(scores)
+
+    assert list(summary['risk_distribution'].items()) == [
+        ('Very Low Risk', 2), ('Low Risk', 1), ('Moderate Risk', 2), ('High Risk', 1), ('Very High Risk', 2)
+    ]
+    assert summary['std_score'] == np.std(scores['score'])
+    assert summary['min_score'] == 0 and summary['max_score'] == 1000
+
+def test_missing_features_score_with_defaults():
+    scorer = RiskScorer()
+    missing = pd.DataFrame({'wallet_id': ['0xa'], **{name: [np.nan] for name in risk_scorer._FEATURE_DEFAULTS}})
+    missing['protocol_version_usage'] = [None]
+    defaults = pd.DataFrame({'wallet_id': ['0xa'], **{name: [value] for name, value in risk_scorer._FEATURE_DEFAULTS.items()}})
+
+    expected = scorer._score_chunk(defaults)['score'].iloc[0]
+    assert scorer._score_chunk(missing)['score'].iloc[0] == expected
+    assert scorer.calculate_risk_score({}) == expected
+    assert scorer.calculate_risk_score({'repayment_frequency': float('nan'), 'protocol_version_usage': None}) == expected
+
+def test_protocol_versions_outside_categories_score_as_unknown():
+    scorer = RiskScorer()
+    versions = pd.Series(['v3', 'v2', 'none', 'unknown', 'both'])
+
+    assert scorer._protocol_version_scores(versions).tolist() == [25, 0, -25, 0, 0]
+    assert scorer._protocol_version_scores(versions.astype('category')).tolist() == [25, 0, -25, 0, 0]
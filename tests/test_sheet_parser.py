@@ -0,0 +1,66 @@
+import io
+import pytest
+import sheet_parser
+from sheet_parser import parse_google_sheet
+
+SHEET_URL = "https://docs.google.com/spreadsheets/d/abc123/edit?usp=sharing"
+WALLET_A = "0x742d35Cc6634C0532925a3b8D4C9db96C4b4d8b6"
+WALLET_B = "0xfaa0768bde629806739c3a4620656c5d26f44ef2"
+
+class RawStream(io.BytesIO):
+    decode_content = False
+
+class FakeResponse:
+    def __init__(self, body: bytes = b'', status_code: int = 200, etag: str = None):
+        self.raw = RawStream(body)
+        self.status_code = status_code
+        self.headers = {'ETag': etag} if etag else {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+@pytest.fixture
+def sheet(monkeypatch):
+    """
+    Queue of responses served to requests.get, with the request headers recorded
+    """
+    monkeypatch.setattr(sheet_parser, '_SHEET_CACHE', {})
+    responses, calls = [], []
+
+    def fake_get(url, headers=None, stream=False):
+        calls.append(headers or {})
+        return responses.pop(0)
+
+    monkeypatch.setattr(sheet_parser.requests, 'get', fake_get)
+    return responses, calls
+
+def test_header_and_blank_leading_cells_are_skipped(sheet):
+    responses, _ = sheet
+    body = f"wallet_id\r\n{WALLET_A}\r\n,  {WALLET_B} ,note\r\nnot-an-address\r\n".encode()
+    responses.append(FakeResponse(body))
+
+    assert parse_google_sheet(SHEET_URL) == [WALLET_A, WALLET_B]
+
+def test_quoted_cell_spanning_lines_stays_one_row(sheet):
+    responses, _ = sheet
+    body = f'wallet_id,comment\r\n{WALLET_A},"first line\r\n{WALLET_B}"\r\n'.encode()
+    responses.append(FakeResponse(body))
+
+    # The second address sits inside a quoted comment, not in a row of its own
+    assert parse_google_sheet(SHEET_URL) == [WALLET_A]
+
+def test_not_modified_reuses_cached_addresses(sheet):
+    responses, calls = sheet
+    responses.append(FakeResponse(f"wallet_id\r\n{WALLET_A}\r\n".encode(), etag='"v1"'))
+    responses.append(FakeResponse(status_code=304))
+
+    assert parse_google_sheet(SHEET_URL) == [WALLET_A]
+    assert parse_google_sheet(SHEET_URL) == [WALLET_A]
+    assert calls == [{}, {'If-None-Match': '"v1"'}]